@@ -1,90 +1,199 @@
 import random
+import math
+import re
+import inspect
 import numpy as np
 import os
-import cv2
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import pandas as pd
+from banco_aptidoes import BancoAptidoes, obter_banco_padrao
+from modelo_substituto import ModeloSubstituto
 from processamento_imagem import (
-    processar_imagem,
-    calcular_similaridade,
+    processar_imagem_binaria,
+    calcular_roi,
+    carregar_alvo,
+    carregar_imagem,
+    assinatura_imagem,
     garantir_pasta_resultados,
+    salvar_imagem,
 )
 
 
-def criar_individuo():
+# Intervalo (mínimo, máximo) de cada parâmetro otimizado
+LIMITES_PARAMETROS = {
+    "threshold": (50, 150),
+    "blur": (1, 5),
+    "dilate_size": (1, 5),
+    "dilate_shape": (1, 5),
+    "erode_size": (1, 5),
+    "erode_shape": (1, 5),
+}
+
+# Margem da região de interesse: cobre o raio do maior blur somado ao maior
+# kernel de erosão, para que a imagem processada seja branca fora da região
+MARGEM_ROI = LIMITES_PARAMETROS["blur"][1] + max(
+    LIMITES_PARAMETROS["erode_size"][1], LIMITES_PARAMETROS["erode_shape"][1]
+)
+
+# Tentativas de mutar um clone antes de substituí-lo por um indivíduo aleatório
+TENTATIVAS_DUPLICADOS = 3
+
+
+def criar_individuo(rng=None):
     """
     Cria um indivíduo aleatório para a população inicial.
 
+    Args:
+        rng: Gerador de números aleatórios (random.Random); padrão: módulo random
+
     Returns:
         Dicionário com os parâmetros do indivíduo
     """
+    rng = rng or random
     return {
-        "threshold": random.randint(50, 150),
-        "blur": random.randint(1, 5),
-        "dilate_size": random.randint(1, 5),
-        "dilate_shape": random.randint(1, 5),
-        "erode_size": random.randint(1, 5),
-        "erode_shape": random.randint(1, 5),
+        param: rng.randint(minimo, maximo)
+        for param, (minimo, maximo) in LIMITES_PARAMETROS.items()
     }
 
 
-def criar_populacao(tamanho):
+def dentro_dos_limites(individuo):
+    """
+    Verifica se todos os parâmetros do indivíduo estão dentro de `LIMITES_PARAMETROS`.
+
+    Args:
+        individuo: Dicionário com os parâmetros do indivíduo
+
+    Returns:
+        True se todos os parâmetros conhecidos estiverem dentro dos limites
+    """
+    return all(
+        minimo <= individuo.get(param, minimo) <= maximo
+        for param, (minimo, maximo) in LIMITES_PARAMETROS.items()
+    )
+
+
+def limitar_individuo(individuo):
+    """
+    Limita cada parâmetro do indivíduo ao seu intervalo em `LIMITES_PARAMETROS`.
+
+    Args:
+        individuo: Dicionário com os parâmetros do indivíduo
+
+    Returns:
+        Novo dicionário com os parâmetros limitados
+    """
+    limitado = dict(individuo)
+    for param, (minimo, maximo) in LIMITES_PARAMETROS.items():
+        if param in limitado:
+            limitado[param] = min(maximo, max(minimo, limitado[param]))
+    return limitado
+
+
+def criar_populacao(tamanho, rng=None):
     """
     Cria uma população inicial de indivíduos.
 
     Args:
         tamanho: Número de indivíduos na população
+        rng: Gerador de números aleatórios (random.Random); padrão: módulo random
 
     Returns:
         Lista de indivíduos (dicionários de parâmetros)
     """
-    return [criar_individuo() for _ in range(tamanho)]
+    return [criar_individuo(rng) for _ in range(tamanho)]
 
 
-def avaliar_individuo(individuo, imagem_path, imagem_alvo_path):
+def avaliar_individuo(individuo, imagem_path, imagem_alvo_path, usar_roi=True):
     """
     Avalia a aptidão de um indivíduo processando a imagem e comparando com a imagem alvo.
 
+    Aptidões já calculadas (nesta ou em execuções anteriores) são lidas do
+    banco de aptidões padrão (`banco_aptidoes.obter_banco_padrao`), que pode
+    ser desativado com `configurar_banco_padrao(None)`.
+
     Args:
         individuo: Dicionário com os parâmetros do indivíduo
         imagem_path: Caminho para a imagem a ser processada
         imagem_alvo_path: Caminho para a imagem alvo
+        usar_roi: Se True, processa e compara apenas a região de interesse da
+            imagem (`calcular_roi`); a aptidão é a mesma da imagem inteira.
+            Indivíduos fora de `LIMITES_PARAMETROS` usam a imagem inteira
 
     Returns:
         Valor de aptidão (similaridade) entre 0 e 1
     """
-    # Processar a imagem com os parâmetros do indivíduo
-    imagem_processada = processar_imagem(individuo, imagem_path)
+    banco = obter_banco_padrao()
+    chave = None
+    if banco is not None:
+        chave = BancoAptidoes.chave(individuo, imagem_path, imagem_alvo_path, usar_roi)
+    if chave is not None:
+        aptidao = banco.obter(chave)
+        if aptidao is not None:
+            return aptidao
+
+    aptidao = _calcular_aptidao(individuo, imagem_path, imagem_alvo_path, usar_roi)
+    if chave is not None:
+        banco.guardar(chave, aptidao)
+    return aptidao
+
+
+def _calcular_aptidao(individuo, imagem_path, imagem_alvo_path, usar_roi):
+    """
+    Calcula a aptidão de um indivíduo no pipeline de imagem (sem o banco).
+    """
+    # Região de interesse (calculada uma vez por imagem e mantida em cache).
+    # Ela só é exata para parâmetros dentro dos limites (o limiar máximo e a
+    # margem dependem deles); fora dos limites, usar a imagem inteira
+    roi = None
+    formato = None
+    if usar_roi and dentro_dos_limites(individuo):
+        roi = calcular_roi(
+            imagem_path,
+            limiar_maximo=LIMITES_PARAMETROS["threshold"][1],
+            margem=MARGEM_ROI,
+        )
+        if roi is None:
+            return 0
+        formato = carregar_imagem(imagem_path).shape[:2]
+
+    # Processar a imagem com os parâmetros do indivíduo (representação binária)
+    imagem_processada = processar_imagem_binaria(individuo, imagem_path, roi=roi)
     if imagem_processada is None:
         return 0
 
-    # Carregar a imagem alvo
-    imagem_alvo = cv2.imread(imagem_alvo_path)
+    # Carregar a imagem alvo (preparada e mantida em cache)
+    if formato is None:
+        formato = (imagem_processada.altura, imagem_processada.largura)
+    imagem_alvo = carregar_alvo(imagem_alvo_path, formato=formato, roi=roi)
     if imagem_alvo is None:
         print(f"Erro ao carregar a imagem alvo: {imagem_alvo_path}")
         return 0
 
     # Calcular a similaridade
-    similaridade = calcular_similaridade(imagem_processada, imagem_alvo)
+    similaridade = imagem_alvo.similaridade(imagem_processada)
     return similaridade
 
 
-def selecionar_pais(populacao, aptidoes):
+def selecionar_pais(populacao, aptidoes, rng=None):
     """
     Seleciona dois pais da população usando o método da roleta.
 
     Args:
         populacao: Lista de indivíduos
         aptidoes: Lista de valores de aptidão correspondentes
+        rng: Gerador de números aleatórios (random.Random); padrão: módulo random
 
     Returns:
         Tupla com dois indivíduos selecionados como pais
     """
+    rng = rng or random
+
     # Calcular a soma total das aptidões
     soma_aptidoes = sum(aptidoes)
     if soma_aptidoes == 0:
         # Se todas as aptidões forem zero, selecionar aleatoriamente
-        return random.sample(populacao, 2)
+        return rng.sample(populacao, 2)
 
     # Normalizar as aptidões para criar probabilidades
     probabilidades = [apt / soma_aptidoes for apt in aptidoes]
@@ -93,7 +202,7 @@ def selecionar_pais(populacao, aptidoes):
     pais = []
     for _ in range(2):
         # Gerar um número aleatório entre 0 e 1
-        r = random.random()
+        r = rng.random()
         # Percorrer a população e selecionar um indivíduo
         soma_prob = 0
         for i, prob in enumerate(probabilidades):
@@ -103,126 +212,689 @@ def selecionar_pais(populacao, aptidoes):
                 break
         # Se não selecionou ninguém (pode acontecer devido a erros de arredondamento)
         if len(pais) <= _:
-            pais.append(random.choice(populacao))
+            pais.append(rng.choice(populacao))
 
     return pais[0], pais[1]
 
 
-def cruzamento(pai1, pai2):
+def cruzamento(pai1, pai2, rng=None):
     """
     Realiza o cruzamento entre dois pais para gerar um filho.
 
     Args:
         pai1: Primeiro pai (dicionário de parâmetros)
         pai2: Segundo pai (dicionário de parâmetros)
+        rng: Gerador de números aleatórios (random.Random); padrão: módulo random
 
     Returns:
         Novo indivíduo (dicionário de parâmetros) gerado pelo cruzamento
     """
+    rng = rng or random
     filho = {}
     for param in pai1.keys():
         # 50% de chance de herdar de cada pai
-        if random.random() < 0.5:
+        if rng.random() < 0.5:
             filho[param] = pai1[param]
         else:
             filho[param] = pai2[param]
     return filho
 
 
-def mutacao(individuo, taxa_mutacao):
+def mutacao(individuo, taxa_mutacao, operador="uniforme", passo=0.1, rng=None):
     """
     Aplica mutação a um indivíduo com uma certa probabilidade.
 
+    Operadores disponíveis:
+        "uniforme": sorteia um novo valor em todo o intervalo do parâmetro
+        "creep": soma um passo gaussiano ao valor atual (desvio padrão igual a
+            `passo` vezes a amplitude do intervalo), limitado ao intervalo
+
     Args:
         individuo: Indivíduo a ser mutado (dicionário de parâmetros)
-        taxa_mutacao: Probabilidade de ocorrer mutação em cada parâmetro
+        taxa_mutacao: Probabilidade de ocorrer mutação em cada parâmetro, ou
+            dicionário com uma taxa por parâmetro
+        operador: Operador de mutação ("uniforme" ou "creep")
+        passo: Tamanho relativo do passo do operador "creep"
+        rng: Gerador de números aleatórios (random.Random); padrão: módulo random
 
     Returns:
         Indivíduo após a mutação
     """
+    rng = rng or random
     for param in individuo.keys():
+        # Taxa de mutação deste parâmetro
+        taxa = (
+            taxa_mutacao.get(param, 0)
+            if isinstance(taxa_mutacao, dict)
+            else taxa_mutacao
+        )
+
         # Verificar se ocorre mutação neste parâmetro
-        if random.random() < taxa_mutacao:
-            # Aplicar mutação de acordo com o tipo de parâmetro
-            if param == "threshold":
-                individuo[param] = random.randint(50, 150)
+        if rng.random() < taxa:
+            minimo, maximo = LIMITES_PARAMETROS[param]
+            if operador == "creep":
+                # Passo gaussiano de pelo menos uma unidade, limitado ao intervalo
+                delta = int(round(rng.gauss(0, passo * (maximo - minimo))))
+                if delta == 0:
+                    delta = rng.choice((-1, 1))
+                individuo[param] = min(maximo, max(minimo, individuo[param] + delta))
+            elif operador == "uniforme":
+                individuo[param] = rng.randint(minimo, maximo)
             else:
-                individuo[param] = random.randint(1, 5)
+                raise ValueError(f"Operador de mutação desconhecido: {operador}")
     return individuo
 
 
-def executar_algoritmo_genetico(
+class AgendaMutacao:
+    """
+    Agenda de mutação constante: mantém a taxa e o passo durante toda a execução.
+
+    Subclasses ajustam `taxa` e `passo` a cada geração em `atualizar`.
+    """
+
+    def __init__(self, taxa, passo=0.1):
+        self.taxa_inicial = taxa
+        self.passo_inicial = passo
+        self.taxa = taxa
+        self.passo = passo
+
+    def atualizar(self, geracao, geracoes, melhorou):
+        """
+        Atualiza a taxa e o passo após a avaliação de uma geração.
+
+        Args:
+            geracao: Índice da geração avaliada
+            geracoes: Número total de gerações
+            melhorou: Se a melhor aptidão global melhorou nesta geração
+
+        Returns:
+            Tupla (taxa, passo) a ser usada na reprodução
+        """
+        return self.taxa, self.passo
+
+
+class AgendaLinear(AgendaMutacao):
+    """
+    Reduz linearmente a taxa e o passo até `fracao_final` dos valores iniciais,
+    favorecendo exploração no início e refinamento no fim da execução.
+    """
+
+    def __init__(self, taxa, passo=0.1, fracao_final=0.25):
+        super().__init__(taxa, passo)
+        self.fracao_final = fracao_final
+
+    def atualizar(self, geracao, geracoes, melhorou):
+        progresso = geracao / max(1, geracoes - 1)
+        fator = 1 - (1 - self.fracao_final) * progresso
+        self.taxa = _escalar_taxa(self.taxa_inicial, fator)
+        self.passo = self.passo_inicial * fator
+        return self.taxa, self.passo
+
+
+class AgendaPlato(AgendaMutacao):
+    """
+    Ajusta a mutação de acordo com o progresso da aptidão.
+
+    Enquanto a melhor aptidão global melhora, a taxa e o passo decaem em direção
+    a `fator_minimo` dos valores iniciais (refinamento local). Após `paciencia`
+    gerações sem melhora (platô), ambos são multiplicados por `fator_aumento`,
+    até `fator_maximo` dos valores iniciais, para escapar do ótimo local.
+    """
+
+    def __init__(
+        self,
+        taxa,
+        passo=0.1,
+        paciencia=5,
+        fator_aumento=1.5,
+        fator_decaimento=0.9,
+        fator_minimo=0.25,
+        fator_maximo=3.0,
+    ):
+        super().__init__(taxa, passo)
+        self.paciencia = paciencia
+        self.fator_aumento = fator_aumento
+        self.fator_decaimento = fator_decaimento
+        self.fator_minimo = fator_minimo
+        self.fator_maximo = fator_maximo
+        self.fator = 1.0
+        self.geracoes_sem_melhora = 0
+
+    def atualizar(self, geracao, geracoes, melhorou):
+        if melhorou:
+            self.geracoes_sem_melhora = 0
+            self.fator = max(self.fator_minimo, self.fator * self.fator_decaimento)
+        else:
+            self.geracoes_sem_melhora += 1
+            if self.geracoes_sem_melhora >= self.paciencia:
+                self.geracoes_sem_melhora = 0
+                self.fator = min(self.fator_maximo, self.fator * self.fator_aumento)
+        self.taxa = _escalar_taxa(self.taxa_inicial, self.fator)
+        self.passo = self.passo_inicial * self.fator
+        return self.taxa, self.passo
+
+
+# Agendas de mutação disponíveis por nome
+AGENDAS_MUTACAO = {
+    "constante": AgendaMutacao,
+    "linear": AgendaLinear,
+    "plato": AgendaPlato,
+}
+
+
+def _escalar_taxa(taxa, fator):
+    """
+    Multiplica uma taxa (ou dicionário de taxas por parâmetro) por um fator,
+    limitando o resultado ao intervalo [0, 1].
+    """
+    if isinstance(taxa, dict):
+        return {param: min(1.0, valor * fator) for param, valor in taxa.items()}
+    return min(1.0, taxa * fator)
+
+
+def criar_agenda_mutacao(agenda, taxa_mutacao, passo_mutacao=0.1):
+    """
+    Cria a agenda de mutação a partir de um nome ou devolve a instância recebida.
+
+    Args:
+        agenda: None, nome da agenda ("constante", "linear" ou "plato") ou
+            instância de AgendaMutacao
+        taxa_mutacao: Taxa de mutação inicial (ou dicionário por parâmetro)
+        passo_mutacao: Passo inicial do operador "creep"
+
+    Returns:
+        Instância de AgendaMutacao
+    """
+    if isinstance(agenda, AgendaMutacao):
+        return agenda
+    nome = agenda or "constante"
+    if nome not in AGENDAS_MUTACAO:
+        raise ValueError(
+            f"Agenda de mutação desconhecida: {nome}. Use uma de: {', '.join(AGENDAS_MUTACAO)}"
+        )
+    return AGENDAS_MUTACAO[nome](taxa_mutacao, passo_mutacao)
+
+
+def gerar_sementes(semente, quantidade):
+    """
+    Deriva sementes independentes a partir de uma semente principal.
+
+    Usa `numpy.random.SeedSequence`, de modo que cada execução (por exemplo,
+    um captcha de um lote) tenha seu próprio fluxo de números aleatórios,
+    reprodutível e independente da ordem em que as execuções acontecem.
+
+    Args:
+        semente: Semente principal (None para sementes não reprodutíveis)
+        quantidade: Número de sementes a gerar
+
+    Returns:
+        Lista de sementes inteiras
+    """
+    filhas = np.random.SeedSequence(semente).spawn(quantidade)
+    return [int(filha.generate_state(1, dtype=np.uint64)[0]) for filha in filhas]
+
+
+def _chave_genoma(individuo):
+    """
+    Chave imutável que identifica o genoma de um indivíduo.
+    """
+    return tuple(sorted(individuo.items()))
+
+
+def medir_diversidade(populacao):
+    """
+    Mede a diversidade genética de uma população.
+
+    A entropia de cada parâmetro é a entropia de Shannon da distribuição dos
+    seus valores na população, normalizada pelo máximo possível (o logaritmo
+    do menor entre o tamanho da população e o número de valores do
+    intervalo): 0 quando todos os indivíduos têm o mesmo valor e 1 quando os
+    valores estão espalhados ao máximo.
+
+    Args:
+        populacao: Lista de indivíduos
+
+    Returns:
+        Dicionário com "genomas_unicos", "fracao_unicos", "entropia"
+        (dicionário parâmetro -> entropia normalizada) e "entropia_media"
+    """
+    tamanho = len(populacao)
+    unicos = len({_chave_genoma(individuo) for individuo in populacao})
+
+    entropia = {}
+    for param, (minimo, maximo) in LIMITES_PARAMETROS.items():
+        maximo_valores = min(tamanho, maximo - minimo + 1)
+        if maximo_valores < 2:
+            entropia[param] = 0.0
+            continue
+        contagens = Counter(individuo[param] for individuo in populacao)
+        valor = -sum(c / tamanho * math.log(c / tamanho) for c in contagens.values())
+        entropia[param] = valor / math.log(maximo_valores)
+
+    return {
+        "genomas_unicos": unicos,
+        "fracao_unicos": unicos / tamanho if tamanho else 0.0,
+        "entropia": entropia,
+        "entropia_media": sum(entropia.values()) / len(entropia),
+    }
+
+
+def substituir_duplicado(individuo, vistos, operador="uniforme", passo=0.1, rng=None):
+    """
+    Transforma um clone em um indivíduo com genoma inédito.
+
+    Muta um parâmetro sorteado do indivíduo (até TENTATIVAS_DUPLICADOS vezes)
+    e, se o genoma continuar repetido, cria um indivíduo aleatório.
+
+    Args:
+        individuo: Indivíduo cujo genoma já foi visto (é modificado)
+        vistos: Conjunto de chaves de genomas já vistos
+        operador: Operador de mutação ("uniforme" ou "creep")
+        passo: Tamanho relativo do passo do operador "creep"
+        rng: Gerador de números aleatórios (random.Random); padrão: módulo random
+
+    Returns:
+        Indivíduo com genoma fora de `vistos` (ou aleatório, se nenhuma
+        tentativa produzir um genoma inédito)
+    """
+    rng = rng or random
+    parametros = list(LIMITES_PARAMETROS)
+    for _ in range(TENTATIVAS_DUPLICADOS):
+        param = rng.choice(parametros)
+        individuo = mutacao(
+            individuo, {param: 1.0}, operador=operador, passo=passo, rng=rng
+        )
+        if _chave_genoma(individuo) not in vistos:
+            return individuo
+    return criar_individuo(rng)
+
+
+def avaliar_populacao(
+    populacao,
     imagem_path,
     imagem_alvo_path,
-    tamanho_populacao=20,
-    geracoes=50,
-    taxa_mutacao=0.2,
-    callback=None,
+    arquivo,
+    modelo=None,
+    fracao_avaliada=1.0,
+    estatisticas=None,
+    trabalhadores=1,
+    usar_roi=True,
 ):
     """
-    Executa o algoritmo genético para encontrar os melhores parâmetros de processamento.
+    Avalia uma população reaproveitando genomas já avaliados.
+
+    Genomas presentes no arquivo de avaliações não são reavaliados. Se houver
+    um modelo substituto pronto, ele estima a aptidão dos genomas novos e só a
+    fração mais promissora (`fracao_avaliada`) passa pelo pipeline real; os
+    demais recebem a aptidão estimada, usada apenas na seleção de pais.
 
     Args:
+        populacao: Lista de indivíduos
         imagem_path: Caminho para a imagem a ser processada
         imagem_alvo_path: Caminho para a imagem alvo
-        tamanho_populacao: Tamanho da população
-        geracoes: Número de gerações
-        taxa_mutacao: Taxa de mutação
+        arquivo: Dicionário genoma -> aptidão real, atualizado com as novas avaliações
+        modelo: ModeloSubstituto (opcional)
+        fracao_avaliada: Fração dos genomas novos avaliada no pipeline real
+        estatisticas: Dicionário de contadores atualizado com as avaliações
+        trabalhadores: Número de threads usadas nas avaliações reais. Os
+            resultados são consolidados na ordem da população, então o
+            resultado não depende do número de trabalhadores.
+        usar_roi: Se True, avalia apenas a região de interesse das imagens
+
+    Returns:
+        Tupla (aptidões, avaliados), onde `avaliados[i]` indica se a aptidão do
+        indivíduo i é real (e não estimada)
+    """
+    if estatisticas is None:
+        estatisticas = {}
+    for contador in ("avaliacoes_reais", "avaliacoes_repetidas", "avaliacoes_estimadas"):
+        estatisticas.setdefault(contador, 0)
+
+    aptidoes = [None] * len(populacao)
+    avaliados = [True] * len(populacao)
+
+    # Agrupar os genomas novos (um mesmo genoma pode aparecer várias vezes)
+    novos = {}
+    for i, individuo in enumerate(populacao):
+        chave = _chave_genoma(individuo)
+        if chave in arquivo:
+            aptidoes[i] = arquivo[chave]
+            estatisticas["avaliacoes_repetidas"] += 1
+        else:
+            novos.setdefault(chave, []).append(i)
+
+    # Pré-selecionar os genomas novos mais promissores com o modelo substituto
+    chaves_reais = list(novos)
+    if modelo is not None and modelo.pronto and novos:
+        previsoes = modelo.prever([populacao[indices[0]] for indices in novos.values()])
+        quantidade = max(1, math.ceil(fracao_avaliada * len(novos)))
+        ordem = sorted(range(len(novos)), key=lambda j: previsoes[j], reverse=True)
+        chaves = list(novos)
+        chaves_reais = [chaves[j] for j in ordem[:quantidade]]
+        for j in ordem[quantidade:]:
+            for i in novos[chaves[j]]:
+                aptidoes[i] = float(previsoes[j])
+                avaliados[i] = False
+                estatisticas["avaliacoes_estimadas"] += 1
+
+    # Buscar no banco de aptidões, com uma consulta para toda a geração
+    individuos_reais = [populacao[novos[chave][0]] for chave in chaves_reais]
+    aptidoes_reais = [None] * len(individuos_reais)
+    banco = obter_banco_padrao() if individuos_reais else None
+    chaves_banco = None
+    if banco is not None:
+        chaves_banco = BancoAptidoes.chaves(
+            individuos_reais, imagem_path, imagem_alvo_path, usar_roi
+        )
+    if chaves_banco is not None:
+        guardadas = banco.obter_varios(chaves_banco)
+        aptidoes_reais = [guardadas.get(chave) for chave in chaves_banco]
+    pendentes = [i for i, aptidao in enumerate(aptidoes_reais) if aptidao is None]
+
+    # Avaliar no pipeline real (em paralelo, se houver mais de um trabalhador)
+    if trabalhadores > 1 and len(pendentes) > 1:
+        with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+            calculadas = list(
+                executor.map(
+                    lambda i: _calcular_aptidao(
+                        individuos_reais[i], imagem_path, imagem_alvo_path, usar_roi
+                    ),
+                    pendentes,
+                )
+            )
+    else:
+        calculadas = [
+            _calcular_aptidao(
+                individuos_reais[i], imagem_path, imagem_alvo_path, usar_roi
+            )
+            for i in pendentes
+        ]
+    for i, aptidao in zip(pendentes, calculadas):
+        aptidoes_reais[i] = aptidao
+
+    # Guardar as novas aptidões no banco, em uma única transação
+    if chaves_banco is not None:
+        banco.guardar_varios([(chaves_banco[i], aptidoes_reais[i]) for i in pendentes])
+
+    # Consolidar os resultados na ordem original
+    for chave, aptidao in zip(chaves_reais, aptidoes_reais):
+        indices = novos[chave]
+        arquivo[chave] = aptidao
+        if modelo is not None:
+            modelo.adicionar(populacao[indices[0]], aptidao)
+        estatisticas["avaliacoes_reais"] += 1
+        estatisticas["avaliacoes_repetidas"] += len(indices) - 1
+        for i in indices:
+            aptidoes[i] = aptidao
+
+    return aptidoes, avaliados
+
+
+class EventoGeracao:
+    """
+    Resumo de uma geração emitido pelos geradores de otimização.
+
+    Cada evento carrega apenas o que mudou na geração (o melhor indivíduo da
+    geração, o melhor global e os contadores da geração), sem os históricos
+    completos; quem consome os eventos decide o que acumular.
+    """
+
+    __slots__ = (
+        "geracao",
+        "geracoes",
+        "melhor_individuo",
+        "melhor_aptidao",
+        "melhor_global",
+        "melhor_aptidao_global",
+        "melhorou",
+        "avaliacoes_reais",
+        "taxa_mutacao",
+        "passo_mutacao",
+        "diversidade",
+    )
+
+    def __init__(
+        self,
+        geracao,
+        geracoes,
+        melhor_individuo,
+        melhor_aptidao,
+        melhor_global,
+        melhor_aptidao_global,
+        melhorou,
+        avaliacoes_reais=0,
+        taxa_mutacao=None,
+        passo_mutacao=None,
+        diversidade=None,
+    ):
+        """
+        Args:
+            geracao: Índice da geração
+            geracoes: Número total de gerações
+            melhor_individuo: Melhor indivíduo desta geração
+            melhor_aptidao: Aptidão do melhor indivíduo desta geração
+            melhor_global: Melhor indivíduo encontrado até esta geração
+            melhor_aptidao_global: Aptidão do melhor indivíduo global
+            melhorou: Se o melhor global mudou nesta geração
+            avaliacoes_reais: Avaliações no pipeline real feitas nesta geração
+            taxa_mutacao: Taxa de mutação usada na reprodução (se houver)
+            passo_mutacao: Passo de mutação usado na reprodução (se houver)
+            diversidade: Diversidade da população avaliada (ver `medir_diversidade`)
+        """
+        self.geracao = geracao
+        self.geracoes = geracoes
+        self.melhor_individuo = melhor_individuo
+        self.melhor_aptidao = melhor_aptidao
+        self.melhor_global = melhor_global
+        self.melhor_aptidao_global = melhor_aptidao_global
+        self.melhorou = melhorou
+        self.avaliacoes_reais = avaliacoes_reais
+        self.taxa_mutacao = taxa_mutacao
+        self.passo_mutacao = passo_mutacao
+        self.diversidade = diversidade
+
+
+def _aceita_argumento(funcao, nome):
+    """
+    Verifica se uma função aceita o argumento nomeado `nome` (ou **kwargs).
+    """
+    try:
+        parametros = inspect.signature(funcao).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(
+        p.name == nome or p.kind == inspect.Parameter.VAR_KEYWORD for p in parametros
+    )
+
+
+def consumir_eventos(eventos, callback=None, limite_historico=None):
+    """
+    Consome os eventos de uma otimização montando os históricos.
+
+    Mantém o contrato de `executar_algoritmo_genetico`: o callback recebe a
+    cada geração os mesmos argumentos nomeados, e um retorno falso interrompe
+    a otimização (o gerador é fechado antes da reprodução da geração). Callbacks
+    que aceitam o argumento `diversidade` (ou **kwargs) também recebem a
+    diversidade da população avaliada.
+
+    Args:
+        eventos: Iterável de EventoGeracao (por exemplo, `iterar_algoritmo_genetico`)
         callback: Função de callback para atualizar a interface (opcional)
+        limite_historico: Número máximo de gerações mantidas nos históricos.
+            Com um limite, os históricos são buffers circulares (`deque`) com
+            apenas as últimas gerações, e a memória não cresce com o número
+            de gerações (None mantém listas completas)
 
     Returns:
-        Tupla com o melhor indivíduo e seu valor de aptidão
+        Tupla com o melhor indivíduo, seu valor de aptidão, o histórico de
+        aptidões e o histórico de parâmetros
+    """
+    melhor_global = None
+    melhor_aptidao_global = 0
+    if limite_historico is None:
+        historico_aptidoes = []
+        historico_parametros = {param: [] for param in LIMITES_PARAMETROS}
+    else:
+        historico_aptidoes = deque(maxlen=limite_historico)
+        historico_parametros = {
+            param: deque(maxlen=limite_historico) for param in LIMITES_PARAMETROS
+        }
+    extras = {}
+    com_diversidade = callback is not None and _aceita_argumento(
+        callback, "diversidade"
+    )
+
+    try:
+        for evento in eventos:
+            melhor_global = evento.melhor_global
+            melhor_aptidao_global = evento.melhor_aptidao_global
+
+            # Registrar histórico
+            historico_aptidoes.append(evento.melhor_aptidao)
+            for param, valor in evento.melhor_individuo.items():
+                historico_parametros[param].append(valor)
+
+            # Chamar a função de callback, se fornecida
+            if callback:
+                if com_diversidade:
+                    extras["diversidade"] = evento.diversidade
+                continuar = callback(
+                    geracao=evento.geracao,
+                    geracoes=evento.geracoes,
+                    melhor_individuo=evento.melhor_individuo,
+                    melhor_aptidao=evento.melhor_aptidao,
+                    melhor_global=melhor_global,
+                    melhor_aptidao_global=melhor_aptidao_global,
+                    historico_aptidoes=historico_aptidoes,
+                    historico_parametros=historico_parametros,
+                    **extras,
+                )
+                if not continuar:
+                    break
+    finally:
+        if hasattr(eventos, "close"):
+            eventos.close()
+
+    return (
+        melhor_global,
+        melhor_aptidao_global,
+        historico_aptidoes,
+        historico_parametros,
+    )
+
+
+def iterar_algoritmo_genetico(
+    imagem_path,
+    imagem_alvo_path,
+    tamanho_populacao=20,
+    geracoes=50,
+    taxa_mutacao=0.2,
+    operador_mutacao="uniforme",
+    passo_mutacao=0.1,
+    agenda_mutacao=None,
+    substituto=False,
+    fracao_avaliada=0.5,
+    estatisticas=None,
+    semente=None,
+    trabalhadores=1,
+    populacao_inicial=None,
+    usar_roi=True,
+    eliminar_duplicados=False,
+):
+    """
+    Executa o algoritmo genético como um gerador, emitindo um evento por geração.
+
+    A geração seguinte só é produzida quando o próximo evento é pedido, então
+    interromper a iteração (ou fechar o gerador) encerra a execução sem
+    reproduzir a população. Os argumentos são os de
+    `executar_algoritmo_genetico`, exceto o callback.
+
+    Yields:
+        EventoGeracao de cada geração, emitido após a avaliação e antes da
+        reprodução da população
     """
-    # Criar a população inicial
-    populacao = criar_populacao(tamanho_populacao)
+    # Gerador de números aleatórios isolado desta execução
+    rng = random.Random(semente)
+
+    # Criar a população inicial (aproveitando indivíduos fornecidos, se houver)
+    populacao = [
+        limitar_individuo(individuo) for individuo in (populacao_inicial or [])
+    ]
+    populacao = populacao[:tamanho_populacao]
+    populacao += criar_populacao(tamanho_populacao - len(populacao), rng)
+
+    # Agenda que controla a taxa e o passo de mutação ao longo das gerações
+    agenda = criar_agenda_mutacao(agenda_mutacao, taxa_mutacao, passo_mutacao)
+
+    # Aptidões reais já calculadas e modelo substituto opcional
+    arquivo = {}
+    modelo = substituto
+    if substituto is True:
+        modelo = ModeloSubstituto(LIMITES_PARAMETROS, minimo_amostras=tamanho_populacao)
+    elif not substituto:
+        modelo = None
+    if estatisticas is None:
+        estatisticas = {}
+    if eliminar_duplicados:
+        estatisticas.setdefault("duplicados_substituidos", 0)
+
+    # Genomas já vistos (usados apenas na eliminação de duplicados)
+    vistos = set()
 
     # Melhor indivíduo global
     melhor_global = None
     melhor_aptidao_global = 0
 
-    # Histórico de aptidões e parâmetros
-    historico_aptidoes = []
-    historico_parametros = {}
-    for param in populacao[0].keys():
-        historico_parametros[param] = []
-
     # Loop principal do algoritmo genético
     for geracao in range(geracoes):
         # Avaliar cada indivíduo da população
-        aptidoes = []
-        for individuo in populacao:
-            aptidao = avaliar_individuo(individuo, imagem_path, imagem_alvo_path)
-            aptidoes.append(aptidao)
-
-        # Encontrar o melhor indivíduo desta geração
-        melhor_indice = aptidoes.index(max(aptidoes))
+        avaliacoes_anteriores = estatisticas.get("avaliacoes_reais", 0)
+        aptidoes, avaliados = avaliar_populacao(
+            populacao,
+            imagem_path,
+            imagem_alvo_path,
+            arquivo,
+            modelo=modelo,
+            fracao_avaliada=fracao_avaliada,
+            estatisticas=estatisticas,
+            trabalhadores=trabalhadores,
+            usar_roi=usar_roi,
+        )
+
+        # Encontrar o melhor indivíduo desta geração (entre as aptidões reais)
+        melhor_indice = max(
+            (i for i in range(len(populacao)) if avaliados[i]),
+            key=lambda i: aptidoes[i],
+        )
         melhor_individuo = populacao[melhor_indice]
         melhor_aptidao = aptidoes[melhor_indice]
 
         # Atualizar o melhor global se necessário
-        if melhor_aptidao > melhor_aptidao_global:
+        melhorou = melhor_aptidao > melhor_aptidao_global
+        if melhorou:
             melhor_global = melhor_individuo.copy()
             melhor_aptidao_global = melhor_aptidao
 
-        # Registrar histórico
-        historico_aptidoes.append(melhor_aptidao)
-        for param, valor in melhor_individuo.items():
-            historico_parametros[param].append(valor)
-
-        # Chamar a função de callback, se fornecida
-        if callback:
-            continuar = callback(
-                geracao=geracao,
-                geracoes=geracoes,
-                melhor_individuo=melhor_individuo,
-                melhor_aptidao=melhor_aptidao,
-                melhor_global=melhor_global,
-                melhor_aptidao_global=melhor_aptidao_global,
-                historico_aptidoes=historico_aptidoes,
-                historico_parametros=historico_parametros,
-            )
-            if not continuar:
-                break
+        # Ajustar a mutação de acordo com a agenda
+        taxa_atual, passo_atual = agenda.atualizar(geracao, geracoes, melhorou)
+
+        diversidade = medir_diversidade(populacao)
+        if eliminar_duplicados:
+            vistos.update(_chave_genoma(individuo) for individuo in populacao)
+
+        yield EventoGeracao(
+            geracao,
+            geracoes,
+            melhor_individuo,
+            melhor_aptidao,
+            melhor_global,
+            melhor_aptidao_global,
+            melhorou,
+            estatisticas["avaliacoes_reais"] - avaliacoes_anteriores,
+            taxa_atual,
+            passo_atual,
+            diversidade,
+        )
 
         # Criar a nova população
         nova_populacao = []
@@ -233,13 +905,24 @@ def executar_algoritmo_genetico(
         # Gerar o resto da população
         while len(nova_populacao) < tamanho_populacao:
             # Selecionar pais
-            pai1, pai2 = selecionar_pais(populacao, aptidoes)
+            pai1, pai2 = selecionar_pais(populacao, aptidoes, rng)
 
             # Cruzamento
-            filho = cruzamento(pai1, pai2)
+            filho = cruzamento(pai1, pai2, rng)
 
             # Mutação
-            filho = mutacao(filho, taxa_mutacao)
+            filho = mutacao(
+                filho, taxa_atual, operador=operador_mutacao, passo=passo_atual, rng=rng
+            )
+
+            # Substituir clones (da nova população ou de gerações anteriores)
+            if eliminar_duplicados:
+                if _chave_genoma(filho) in vistos:
+                    filho = substituir_duplicado(
+                        filho, vistos, operador_mutacao, passo_atual, rng
+                    )
+                    estatisticas["duplicados_substituidos"] += 1
+                vistos.add(_chave_genoma(filho))
 
             # Adicionar à nova população
             nova_populacao.append(filho)
@@ -247,16 +930,98 @@ def executar_algoritmo_genetico(
         # Substituir a população antiga pela nova
         populacao = nova_populacao
 
-    return (
-        melhor_global,
-        melhor_aptidao_global,
-        historico_aptidoes,
-        historico_parametros,
+
+def executar_algoritmo_genetico(
+    imagem_path,
+    imagem_alvo_path,
+    tamanho_populacao=20,
+    geracoes=50,
+    taxa_mutacao=0.2,
+    callback=None,
+    operador_mutacao="uniforme",
+    passo_mutacao=0.1,
+    agenda_mutacao=None,
+    substituto=False,
+    fracao_avaliada=0.5,
+    estatisticas=None,
+    semente=None,
+    trabalhadores=1,
+    populacao_inicial=None,
+    usar_roi=True,
+    eliminar_duplicados=False,
+    limite_historico=None,
+):
+    """
+    Executa o algoritmo genético para encontrar os melhores parâmetros de processamento.
+
+    Consome os eventos de `iterar_algoritmo_genetico`, montando os históricos
+    e chamando o callback a cada geração.
+
+    Args:
+        imagem_path: Caminho para a imagem a ser processada
+        imagem_alvo_path: Caminho para a imagem alvo
+        tamanho_populacao: Tamanho da população
+        geracoes: Número de gerações
+        taxa_mutacao: Taxa de mutação (ou dicionário com uma taxa por parâmetro)
+        callback: Função de callback para atualizar a interface (opcional)
+        operador_mutacao: Operador de mutação ("uniforme" ou "creep")
+        passo_mutacao: Passo relativo inicial do operador "creep"
+        agenda_mutacao: Agenda da taxa/passo de mutação ("constante", "linear",
+            "plato" ou instância de AgendaMutacao)
+        substituto: Se True (ou uma instância de ModeloSubstituto), usa um modelo
+            substituto para pré-selecionar os filhos avaliados no pipeline real
+        fracao_avaliada: Fração dos genomas novos de cada geração avaliada no
+            pipeline real quando o modelo substituto está ativo
+        estatisticas: Dicionário (opcional) preenchido com os contadores
+            "avaliacoes_reais", "avaliacoes_repetidas" e "avaliacoes_estimadas"
+        semente: Semente do gerador de números aleatórios desta execução. A
+            execução usa um gerador próprio, isolado do estado global de `random`
+        trabalhadores: Número de threads de avaliação; o histórico é idêntico
+            para qualquer número de trabalhadores
+        populacao_inicial: Indivíduos usados na população inicial (warm start),
+            limitados a `LIMITES_PARAMETROS` e completados com indivíduos
+            aleatórios se necessário (opcional)
+        usar_roi: Se True, processa e compara apenas a região de interesse das
+            imagens (mesma aptidão, menos pixels processados)
+        eliminar_duplicados: Se True, filhos com genomas já vistos (na nova
+            população ou em gerações anteriores) são mutados ou substituídos
+            por indivíduos aleatórios; o número de substituições é contado em
+            `estatisticas["duplicados_substituidos"]`
+        limite_historico: Número máximo de gerações mantidas nos históricos
+            (buffers circulares); None mantém o histórico completo
+
+    Returns:
+        Tupla com o melhor indivíduo, seu valor de aptidão, o histórico de
+        aptidões e o histórico de parâmetros
+    """
+    eventos = iterar_algoritmo_genetico(
+        imagem_path,
+        imagem_alvo_path,
+        tamanho_populacao=tamanho_populacao,
+        geracoes=geracoes,
+        taxa_mutacao=taxa_mutacao,
+        operador_mutacao=operador_mutacao,
+        passo_mutacao=passo_mutacao,
+        agenda_mutacao=agenda_mutacao,
+        substituto=substituto,
+        fracao_avaliada=fracao_avaliada,
+        estatisticas=estatisticas,
+        semente=semente,
+        trabalhadores=trabalhadores,
+        populacao_inicial=populacao_inicial,
+        usar_roi=usar_roi,
+        eliminar_duplicados=eliminar_duplicados,
     )
+    return consumir_eventos(eventos, callback, limite_historico)
 
 
 def salvar_resultados(
-    captcha_nome, melhor_individuo, melhor_aptidao, imagem_original, imagem_processada
+    captcha_nome,
+    melhor_individuo,
+    melhor_aptidao,
+    imagem_original,
+    imagem_processada,
+    escritor=None,
 ):
     """
     Salva os resultados do processamento de um captcha.
@@ -267,6 +1032,7 @@ def salvar_resultados(
         melhor_aptidao: Valor de aptidão do melhor indivíduo
         imagem_original: Imagem original do captcha
         imagem_processada: Imagem processada com os melhores parâmetros
+        escritor: EscritorAssincrono para gravar a imagem em segundo plano (opcional)
 
     Returns:
         Dicionário com informações sobre o resultado
@@ -280,10 +1046,15 @@ def salvar_resultados(
     # Nome base para os arquivos (sem extensão)
     nome_base = os.path.splitext(captcha_nome)[0]
 
-    # Salvar a imagem processada
-    nome_arquivo_processado = f"{nome_base}_processado_{timestamp}.png"
-    caminho_processado = os.path.join(pasta_resultados, nome_arquivo_processado)
-    cv2.imwrite(caminho_processado, imagem_processada)
+    # Salvar a imagem processada (em segundo plano, se houver um escritor)
+    if escritor is not None:
+        nome_arquivo_processado = escritor.escrever(
+            f"{nome_base}_processado_{timestamp}", imagem_processada
+        )
+    else:
+        nome_arquivo_processado = f"{nome_base}_processado_{timestamp}.png"
+        caminho_processado = os.path.join(pasta_resultados, nome_arquivo_processado)
+        salvar_imagem(caminho_processado, imagem_processada)
 
     # Salvar os parâmetros em um arquivo de texto
     nome_arquivo_params = f"{nome_base}_params_{timestamp}.txt"
@@ -333,3 +1104,271 @@ def calcular_media_parametros(resultados):
         media_params[param] = int(round(soma / len(resultados)))
 
     return media_params
+
+
+def _vizinhos_parametros(individuo):
+    """
+    Vizinhos de um indivíduo: um passo para cima e para baixo em cada
+    parâmetro (5% da amplitude, no mínimo 1), respeitando os limites.
+    """
+    vizinhos = []
+    for param, (minimo, maximo) in LIMITES_PARAMETROS.items():
+        passo = max(1, round(0.05 * (maximo - minimo)))
+        for delta in (-passo, passo):
+            valor = min(maximo, max(minimo, individuo[param] + delta))
+            if valor != individuo[param]:
+                vizinho = individuo.copy()
+                vizinho[param] = valor
+                vizinhos.append(vizinho)
+    return vizinhos
+
+
+def agregar_parametros(
+    resultados, pares, refinamentos=3, trabalhadores=1, estatisticas=None
+):
+    """
+    Escolhe um único conjunto de parâmetros para todos os captchas.
+
+    Ao contrário de `calcular_media_parametros`, os candidatos são avaliados:
+    o melhor de cada captcha, a média e a mediana dos parâmetros são
+    pontuados pela aptidão média em todos os pares de treino, e o vencedor é
+    refinado por busca local (vizinhos de cada parâmetro) enquanto melhorar.
+
+    Cada rodada avalia todos os candidatos de uma vez em cada par, de forma
+    que o desfoque e o threshold de cada imagem saem do cache e genomas
+    repetidos não são reavaliados.
+
+    Args:
+        resultados: Lista de dicionários com resultados (com "parametros")
+        pares: Lista de tuplas (caminho do captcha, caminho do alvo)
+        refinamentos: Número máximo de rodadas de busca local
+        trabalhadores: Número de threads usadas nas avaliações
+        estatisticas: Dicionário de contadores atualizado com as avaliações
+
+    Returns:
+        Tupla (parâmetros escolhidos, aptidão média nos pares), ou (None, 0)
+        se não houver resultados ou pares
+    """
+    if not resultados or not pares:
+        return None, 0
+
+    # Candidatos: melhores de cada captcha, média e mediana
+    candidatos = [dict(r["parametros"]) for r in resultados]
+    candidatos.append(calcular_media_parametros(resultados))
+    candidatos.append(
+        {
+            param: int(round(np.median([r["parametros"][param] for r in resultados])))
+            for param in resultados[0]["parametros"]
+        }
+    )
+
+    # Um arquivo de avaliações por par, compartilhado entre as rodadas
+    arquivos = [{} for _ in pares]
+
+    def pontuar(individuos):
+        soma = np.zeros(len(individuos))
+        for (imagem_path, imagem_alvo_path), arquivo in zip(pares, arquivos):
+            aptidoes, _ = avaliar_populacao(
+                individuos,
+                imagem_path,
+                imagem_alvo_path,
+                arquivo,
+                estatisticas=estatisticas,
+                trabalhadores=trabalhadores,
+            )
+            soma += aptidoes
+        return soma / len(pares)
+
+    pontuacoes = pontuar(candidatos)
+    indice = int(np.argmax(pontuacoes))
+    melhor, melhor_aptidao = candidatos[indice], float(pontuacoes[indice])
+
+    # Busca local em torno do melhor candidato
+    for _ in range(refinamentos):
+        vizinhos = _vizinhos_parametros(melhor)
+        pontuacoes = pontuar(vizinhos)
+        indice = int(np.argmax(pontuacoes))
+        if pontuacoes[indice] <= melhor_aptidao:
+            break
+        melhor, melhor_aptidao = vizinhos[indice], float(pontuacoes[indice])
+
+    return melhor, melhor_aptidao
+
+
+def ler_arquivo_parametros(caminho):
+    """
+    Lê um arquivo de parâmetros salvo por `salvar_resultados` ou pelo app
+    (`params_media_*.txt`).
+
+    Args:
+        caminho: Caminho para o arquivo de parâmetros
+
+    Returns:
+        Dicionário com "captcha" (None para parâmetros médios), "aptidao"
+        (None se ausente), "parametros" e "arquivo", ou None se o arquivo não
+        contiver todos os parâmetros
+    """
+    captcha = None
+    aptidao = None
+    parametros = {}
+    with open(caminho) as f:
+        for linha in f:
+            encontrado = re.match(r"^Parâmetros para (.+):\s*$", linha)
+            if encontrado:
+                captcha = encontrado.group(1)
+                continue
+            encontrado = re.match(r"^Aptidão:\s*(-?[\d.]+)\s*$", linha)
+            if encontrado:
+                aptidao = float(encontrado.group(1))
+                continue
+            # Linhas de parâmetro têm o formato "  param: valor"
+            encontrado = re.match(r"^\s+(\w+):\s*(-?\d+)\s*$", linha)
+            if encontrado and encontrado.group(1) in LIMITES_PARAMETROS:
+                parametros[encontrado.group(1)] = int(encontrado.group(2))
+
+    if set(parametros) != set(LIMITES_PARAMETROS):
+        return None
+    return {
+        "captcha": captcha,
+        "aptidao": aptidao,
+        "parametros": parametros,
+        "arquivo": caminho,
+    }
+
+
+def carregar_resultados_anteriores(pasta="resultados"):
+    """
+    Carrega os parâmetros salvos em execuções anteriores.
+
+    Args:
+        pasta: Pasta de resultados
+
+    Returns:
+        Lista de resultados (ver `ler_arquivo_parametros`), do mais recente
+        para o mais antigo
+    """
+    if not os.path.isdir(pasta):
+        return []
+
+    arquivos = []
+    with os.scandir(pasta) as entradas:
+        for entrada in entradas:
+            nome = entrada.name
+            if entrada.is_file() and nome.endswith(".txt"):
+                if "_params_" in nome or nome.startswith("params_media_"):
+                    arquivos.append((entrada.stat().st_mtime, entrada.path))
+
+    resultados = []
+    for _, caminho in sorted(arquivos, reverse=True):
+        resultado = ler_arquivo_parametros(caminho)
+        if resultado is not None:
+            resultados.append(resultado)
+    return resultados
+
+
+def selecionar_sementes_populacao(
+    anteriores, captcha_nome, imagem_path=None, maximo=10
+):
+    """
+    Escolhe os parâmetros anteriores usados para aquecer a população inicial.
+
+    A ordem de prioridade é: resultados do mesmo captcha (maior aptidão
+    primeiro), o melhor resultado de cada um dos demais captchas (os mais
+    parecidos primeiro, quando as imagens estão na mesma pasta de
+    `imagem_path`) e, por fim, os parâmetros médios.
+
+    Args:
+        anteriores: Lista retornada por `carregar_resultados_anteriores`
+        captcha_nome: Nome do arquivo do captcha que será otimizado
+        imagem_path: Caminho do captcha, usado para comparar com os demais (opcional)
+        maximo: Número máximo de sementes
+
+    Returns:
+        Lista de indivíduos (dicionários de parâmetros) sem repetições
+    """
+
+    def aptidao(resultado):
+        return resultado["aptidao"] if resultado["aptidao"] is not None else 0
+
+    mesmos = sorted(
+        (r for r in anteriores if r["captcha"] == captcha_nome),
+        key=aptidao,
+        reverse=True,
+    )
+
+    # Melhor resultado de cada um dos demais captchas
+    melhores_outros = {}
+    for resultado in anteriores:
+        nome = resultado["captcha"]
+        if nome is None or nome == captcha_nome:
+            continue
+        if nome not in melhores_outros or aptidao(resultado) > aptidao(
+            melhores_outros[nome]
+        ):
+            melhores_outros[nome] = resultado
+    outros = sorted(melhores_outros.values(), key=aptidao, reverse=True)
+
+    # Ordenar os demais captchas pela semelhança com o captcha atual
+    assinatura = assinatura_imagem(imagem_path) if imagem_path else None
+    if assinatura is not None:
+        pasta = os.path.dirname(imagem_path)
+
+        def distancia(resultado):
+            outra = assinatura_imagem(os.path.join(pasta, resultado["captcha"]))
+            if outra is None:
+                return float("inf")
+            return float(np.abs(assinatura - outra).mean())
+
+        outros = sorted(outros, key=distancia)
+
+    medias = [r for r in anteriores if r["captcha"] is None]
+
+    sementes = []
+    vistos = set()
+    for resultado in mesmos + outros + medias:
+        chave = _chave_genoma(resultado["parametros"])
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        sementes.append(dict(resultado["parametros"]))
+        if len(sementes) == maximo:
+            break
+    return sementes
+
+
+def criar_populacao_aquecida(
+    sementes, tamanho, fracao_aquecida=0.6, passo=0.05, rng=None
+):
+    """
+    Cria uma população inicial a partir de parâmetros de execuções anteriores.
+
+    A população contém as sementes, vizinhos delas (mutação "creep" com passo
+    pequeno) até `fracao_aquecida` da população e, no restante, indivíduos
+    aleatórios para manter a diversidade. As sementes são limitadas aos
+    intervalos de `LIMITES_PARAMETROS` (arquivos antigos ou editados à mão
+    podem ter valores fora deles).
+
+    Args:
+        sementes: Lista de indivíduos anteriores, em ordem de prioridade
+        tamanho: Tamanho da população
+        fracao_aquecida: Fração da população formada por sementes e vizinhos
+        passo: Passo relativo da mutação usada para gerar os vizinhos
+        rng: Gerador de números aleatórios (random.Random); padrão: módulo random
+
+    Returns:
+        Lista de indivíduos
+    """
+    rng = rng or random
+    sementes = [limitar_individuo(semente) for semente in sementes]
+    populacao = [semente.copy() for semente in sementes[:tamanho]]
+
+    # Vizinhos das sementes, alternando entre elas em ordem de prioridade
+    quantidade_aquecida = max(len(populacao), round(fracao_aquecida * tamanho))
+    i = 0
+    while populacao and len(populacao) < quantidade_aquecida:
+        base = sementes[i % len(sementes)].copy()
+        populacao.append(mutacao(base, 0.5, operador="creep", passo=passo, rng=rng))
+        i += 1
+
+    populacao += criar_populacao(tamanho - len(populacao), rng)
+    return populacao
@@ -1,26 +1,66 @@
 import streamlit as st
 import os
-import cv2
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
+import random
 from datetime import datetime
+from itertools import chain
 
-# Importar funções dos outros módulos
-from processamento_imagem import (
-    processar_imagem,
-    calcular_similaridade,
-    garantir_pasta_resultados,
-)
-from algoritmo_genetico import (
-    executar_algoritmo_genetico,
-    salvar_resultados,
-    calcular_media_parametros,
-)
+from indice_dataset import obter_indice
+
+# Os módulos pesados (pandas, matplotlib, OpenCV e o algoritmo genético) são
+# importados dentro das funções que os usam: o Streamlit reexecuta o script a
+# cada interação, e páginas como "Home" e "Sobre o Algoritmo" não precisam
+# deles. As pastas são indexadas por `indice_dataset` (varridas novamente só
+# quando mudam) e as imagens decodificadas ficam em cache.
+
+
+def _modificacao(caminho):
+    """
+    Data de modificação (ns) de um arquivo ou pasta, usada como chave de cache.
+    """
+    try:
+        return os.stat(caminho).st_mtime_ns
+    except OSError:
+        return None
+
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _carregar_imagem_rgb_cache(caminho, modificacao):
+    import cv2
+
+    imagem = cv2.imread(caminho)
+    if imagem is None:
+        return None
+    imagem = cv2.cvtColor(imagem, cv2.COLOR_BGR2RGB)
+    imagem.setflags(write=False)
+    return imagem
+
+
+def carregar_imagem_rgb(caminho):
+    """
+    Carrega uma imagem em RGB para exibição, mantendo-a em cache entre as
+    reexecuções do script enquanto o arquivo não for modificado.
+
+    Args:
+        caminho: Caminho da imagem
+
+    Returns:
+        Imagem RGB somente leitura, ou None se não puder ser lida
+    """
+    return _carregar_imagem_rgb_cache(caminho, _modificacao(caminho))
 
 
 def processar_captchas_streamlit(
-    tamanho_populacao=20, geracoes=50, taxa_mutacao=0.2, mostrar_config=True
+    tamanho_populacao=20,
+    geracoes=50,
+    taxa_mutacao=0.2,
+    mostrar_config=True,
+    otimizador="genetico",
+    semente=None,
+    aquecer=False,
+    geracoes_incrementais=10,
+    agregacao="robusta",
+    eliminar_duplicados=False,
+    limite_historico=500,
 ):
     """
     Processa os captchas usando o algoritmo genético e exibe os resultados no Streamlit.
@@ -30,9 +70,20 @@ def processar_captchas_streamlit(
         geracoes: Número de gerações para o algoritmo genético
         taxa_mutacao: Taxa de mutação para o algoritmo genético
         mostrar_config: Se True, exibe as configurações do algoritmo genético
+        otimizador: Nome do otimizador ("genetico" ou "tpe")
+        semente: Semente principal para execuções reprodutíveis (None para aleatória)
+        aquecer: Se True, inicia a população a partir de resultados anteriores
+        geracoes_incrementais: Gerações usadas nos captchas que já têm resultados
+            anteriores quando `aquecer` é True
+        agregacao: "robusta" (candidatos avaliados em todos os captchas, ver
+            `agregar_parametros`) ou "media" (média simples dos parâmetros)
+        eliminar_duplicados: Se True, o algoritmo genético substitui filhos com
+            genomas já avaliados por indivíduos inéditos
+        limite_historico: Número de gerações mais recentes mantidas nos
+            históricos e nos gráficos (None para todas)
 
     Returns:
-        Tupla com a lista de resultados e os parâmetros médios
+        Tupla com a lista de resultados e os parâmetros agregados
     """
     # Configurações do algoritmo genético
     if mostrar_config:
@@ -46,6 +97,58 @@ def processar_captchas_streamlit(
             geracoes = st.slider("Número de Gerações", 10, 200, geracoes)
         with col3:
             taxa_mutacao = st.slider("Taxa de Mutação", 0.0, 1.0, taxa_mutacao)
+        otimizador = st.selectbox(
+            "Otimizador",
+            ["genetico", "tpe"],
+            format_func=lambda o: {
+                "genetico": "Algoritmo Genético",
+                "tpe": "TPE (Tree-structured Parzen Estimator)",
+            }[o],
+        )
+        if otimizador == "genetico":
+            eliminar_duplicados = st.checkbox(
+                "Eliminar genomas duplicados",
+                value=eliminar_duplicados,
+                help="Substitui filhos com genomas já avaliados por indivíduos mutados ou aleatórios, para avaliar mais genomas distintos com o mesmo orçamento.",
+            )
+        semente = st.number_input(
+            "Semente (0 para aleatória)", min_value=0, value=semente or 0, step=1
+        )
+        semente = int(semente) or None
+
+        # Warm start a partir dos parâmetros salvos em execuções anteriores
+        aquecer = st.checkbox(
+            "Aquecer com resultados anteriores",
+            value=aquecer,
+            help="Inicia a população com os melhores parâmetros já salvos em 'resultados' e seus vizinhos.",
+        )
+        if aquecer:
+            geracoes_incrementais = st.slider(
+                "Gerações para captchas já treinados",
+                1,
+                geracoes,
+                min(geracoes_incrementais, geracoes),
+            )
+
+        agregacao = st.selectbox(
+            "Agregação dos parâmetros",
+            ["robusta", "media"],
+            index=0 if agregacao == "robusta" else 1,
+            format_func=lambda a: {
+                "robusta": "Robusta (candidatos avaliados em todos os captchas)",
+                "media": "Média simples",
+            }[a],
+        )
+
+        # Históricos em buffers circulares: a memória não cresce com as gerações
+        limite_historico = st.number_input(
+            "Gerações exibidas nos gráficos (0 para todas)",
+            min_value=0,
+            value=limite_historico or 0,
+            step=50,
+            help="Mantém apenas as últimas gerações nos históricos de aptidão e de parâmetros, para que execuções longas não ocupem memória.",
+        )
+        limite_historico = int(limite_historico) or None
 
         # Opção para processar todos os captchas ou apenas um
         st.subheader("Seleção de Captchas")
@@ -56,18 +159,13 @@ def processar_captchas_streamlit(
 
         # Pasta de imagens
         pasta_imgs = os.path.join(os.getcwd(), "imgs")
-        if not os.path.exists(pasta_imgs):
+        indice = obter_indice(pasta_imgs)
+        if not indice.existe:
             st.error(f"Pasta de imagens não encontrada: {pasta_imgs}")
             return None, None
 
         # Listar os arquivos de captcha disponíveis
-        captchas = []
-        for arquivo in os.listdir(pasta_imgs):
-            if (
-                arquivo.lower().endswith((".png", ".jpg"))
-                and "target" not in arquivo.lower()
-            ):
-                captchas.append(arquivo)
+        captchas = indice.captchas
 
         if not captchas:
             st.error(f"Nenhum arquivo de captcha encontrado na pasta {pasta_imgs}!")
@@ -85,234 +183,305 @@ def processar_captchas_streamlit(
     else:
         # Se não mostrar configuração, processar todos os captchas automaticamente
         pasta_imgs = os.path.join(os.getcwd(), "imgs")
-        if not os.path.exists(pasta_imgs):
-            return None, None
-
-        captchas = []
-        for arquivo in os.listdir(pasta_imgs):
-            if (
-                arquivo.lower().endswith((".png", ".jpg"))
-                and "target" not in arquivo.lower()
-            ):
-                captchas.append(arquivo)
+        indice = obter_indice(pasta_imgs)
+        captchas = indice.captchas
 
         if not captchas:
             return None, None
 
+    import cv2
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    from processamento_imagem import processar_imagem, garantir_pasta_resultados
+    from escrita_resultados import EscritorAssincrono
+    from algoritmo_genetico import (
+        salvar_resultados,
+        calcular_media_parametros,
+        agregar_parametros,
+        gerar_sementes,
+        carregar_resultados_anteriores,
+        selecionar_sementes_populacao,
+        criar_populacao_aquecida,
+    )
+    from otimizadores import criar_otimizador
+
     # Processar cada captcha
     resultados = []
+    pares = []
     progress_bar = st.progress(0)
     status_text = st.empty()
 
-    for i, captcha in enumerate(captchas):
-        st.subheader(f"Processando captcha: {captcha}")
+    # Uma semente independente por captcha, derivada da semente principal
+    sementes = gerar_sementes(semente, len(captchas))
 
-        # Caminhos para as imagens
-        captcha_path = os.path.join(pasta_imgs, captcha)
-        nome_base = os.path.splitext(captcha)[0]
-        target_path = os.path.join(pasta_imgs, f"{nome_base}_target.png")
+    # Resultados de execuções anteriores para o warm start
+    anteriores = carregar_resultados_anteriores() if aquecer else []
 
-        # Verificar se a imagem alvo existe
-        if not os.path.exists(target_path):
-            st.error(f"Imagem alvo não encontrada: {target_path}")
-            continue
+    # Gravar as imagens processadas em segundo plano durante a otimização
+    escritor = EscritorAssincrono(garantir_pasta_resultados())
 
-        # Exibir as imagens original e alvo
-        col1, col2 = st.columns(2)
-        with col1:
-            captcha_img = cv2.imread(captcha_path)
-            captcha_img_rgb = cv2.cvtColor(captcha_img, cv2.COLOR_BGR2RGB)
-            st.image(
-                captcha_img_rgb, caption=f"Captcha: {captcha}", use_container_width=True
-            )
+    try:
+        for i, captcha in enumerate(captchas):
+            st.subheader(f"Processando captcha: {captcha}")
 
-        with col2:
-            target_img = cv2.imread(target_path)
-            target_img_rgb = cv2.cvtColor(target_img, cv2.COLOR_BGR2RGB)
-            st.image(
-                target_img_rgb,
-                caption=f"Alvo: {nome_base}_target.png",
-                use_container_width=True,
-            )
+            # Caminhos para as imagens
+            captcha_path = os.path.join(pasta_imgs, captcha)
+            nome_base = os.path.splitext(captcha)[0]
+            target_path = indice.alvo(captcha)
 
-        # Criar containers para exibir informações durante o processamento
-        info_container = st.container()  # Será usado apenas no final
-        fitness_container = st.empty()  # Container para exibir o valor atual da aptidão
-        chart_container = st.empty()  # Usamos st.empty() para atualizar o mesmo gráfico
-        image_container = st.empty()  # Usamos st.empty() para atualizar a mesma imagem
-
-        # Função de callback para atualizar a interface durante o processamento
-        def update_ui(
-            geracao,
-            geracoes,
-            melhor_individuo,
-            melhor_aptidao,
-            melhor_global,
-            melhor_aptidao_global,
-            historico_aptidoes,
-            historico_parametros,
-        ):
-            # Atualizar texto de status
-            status_text.text(
-                f"Processando captcha {i+1}/{len(captchas)}: {captcha} - Geração {geracao+1}/{geracoes}"
-            )
+            # Verificar se a imagem alvo existe
+            if target_path is None:
+                st.error(f"Imagem alvo não encontrada: {nome_base}_target.png")
+                continue
 
-            # Atualizar barra de progresso
-            progress = (i / len(captchas)) + ((geracao + 1) / geracoes) / len(captchas)
-            progress_bar.progress(progress)
+            # Exibir as imagens original e alvo
+            col1, col2 = st.columns(2)
+            with col1:
+                captcha_img_rgb = carregar_imagem_rgb(captcha_path)
+                st.image(
+                    captcha_img_rgb, caption=f"Captcha: {captcha}", use_container_width=True
+                )
 
-            # Exibir o valor atual da aptidão em um container separado
-            fitness_html = f"""
-            <div style="display: flex; align-items: center; margin-bottom: 10px;">
-                <div style="flex: 1;">
-                    <h3>Aptidão Atual: <strong>{float(melhor_aptidao):.4f}</strong></h3>
-                </div>
-            </div>
-            """
+            with col2:
+                target_img_rgb = carregar_imagem_rgb(target_path)
+                st.image(
+                    target_img_rgb,
+                    caption=f"Alvo: {nome_base}_target.png",
+                    use_container_width=True,
+                )
+
+            # Criar containers para exibir informações durante o processamento
+            info_container = st.container()  # Será usado apenas no final
+            fitness_container = st.empty()  # Container para exibir o valor atual da aptidão
+            chart_container = st.empty()  # Usamos st.empty() para atualizar o mesmo gráfico
+            image_container = st.empty()  # Usamos st.empty() para atualizar a mesma imagem
+
+            # Função de callback para atualizar a interface durante o processamento
+            def update_ui(
+                geracao,
+                geracoes,
+                melhor_individuo,
+                melhor_aptidao,
+                melhor_global,
+                melhor_aptidao_global,
+                historico_aptidoes,
+                historico_parametros,
+                diversidade=None,
+            ):
+                # Atualizar texto de status
+                status_text.text(
+                    f"Processando captcha {i+1}/{len(captchas)}: {captcha} - Geração {geracao+1}/{geracoes}"
+                )
+
+                # Atualizar barra de progresso
+                progress = (i / len(captchas)) + ((geracao + 1) / geracoes) / len(captchas)
+                progress_bar.progress(progress)
+
+                # Diversidade da população avaliada nesta geração
+                if diversidade:
+                    fitness_container.caption(
+                        f"Diversidade: {diversidade['genomas_unicos']} genomas únicos, "
+                        f"entropia média dos parâmetros {diversidade['entropia_media']:.2f}"
+                    )
 
-            # Adicionar informação sobre a melhor aptidão global se disponível
-            if melhor_aptidao_global > 0:
-                fitness_html += f"""
+                # Exibir o valor atual da aptidão em um container separado
+                fitness_html = f"""
                 <div style="display: flex; align-items: center; margin-bottom: 10px;">
                     <div style="flex: 1;">
-                        <h3>Melhor Aptidão Global: <strong>{float(melhor_aptidao_global):.4f}</strong></h3>
+                        <h3>Aptidão Atual: <strong>{float(melhor_aptidao):.4f}</strong></h3>
                     </div>
                 </div>
                 """
 
-            # Atualizar gráficos usando o container vazio para substituir o anterior
-            # Criar figura com dois subplots
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
+                # Adicionar informação sobre a melhor aptidão global se disponível
+                if melhor_aptidao_global > 0:
+                    fitness_html += f"""
+                    <div style="display: flex; align-items: center; margin-bottom: 10px;">
+                        <div style="flex: 1;">
+                            <h3>Melhor Aptidão Global: <strong>{float(melhor_aptidao_global):.4f}</strong></h3>
+                        </div>
+                    </div>
+                    """
 
-            # Gráfico de aptidão com valor atual e melhor global
-            ax1.plot(historico_aptidoes)
-            ax1.set_title(
-                f"Evolução da Aptidão (Atual: {float(melhor_aptidao):.4f} - Melhor: {float(melhor_aptidao_global):.4f})"
-            )
-            ax1.set_xlabel("Geração")
-            ax1.set_ylabel("Aptidão")
-            ax1.grid(True)
-
-            # Adicionar texto com o valor atual da aptidão e melhor global
-            ax1.text(
-                0.02,
-                0.95,
-                f"Aptidão atual: {float(melhor_aptidao):.4f}\nMelhor aptidão: {float(melhor_aptidao_global):.4f}",
-                transform=ax1.transAxes,
-                fontsize=10,
-                bbox=dict(facecolor="white", alpha=0.8),
-            )
+                # Atualizar gráficos usando o container vazio para substituir o anterior
+                # Criar figura com dois subplots
+                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
 
-            # Gráfico de parâmetros
-            for param, valores in historico_parametros.items():
-                ax2.plot(valores, label=param)
-            ax2.set_title("Evolução dos Parâmetros")
-            ax2.set_xlabel("Geração")
-            ax2.set_ylabel("Valor")
-            ax2.legend()
-            ax2.grid(True)
-
-            # Adicionar texto com os valores atuais dos parâmetros
-            param_text = "\n".join(
-                [f"{param}: {melhor_individuo[param]}" for param in melhor_individuo]
-            )
-            ax2.text(
-                0.02,
-                0.95,
-                param_text,
-                transform=ax2.transAxes,
-                fontsize=9,
-                bbox=dict(facecolor="white", alpha=0.8),
-                verticalalignment="top",
-            )
+                # Gráfico de aptidão com valor atual e melhor global
+                # Com limite de histórico, os gráficos mostram só as últimas gerações
+                eixo_geracoes = range(
+                    geracao + 1 - len(historico_aptidoes), geracao + 1
+                )
+                ax1.plot(eixo_geracoes, historico_aptidoes)
+                ax1.set_title(
+                    f"Evolução da Aptidão (Atual: {float(melhor_aptidao):.4f} - Melhor: {float(melhor_aptidao_global):.4f})"
+                )
+                ax1.set_xlabel("Geração")
+                ax1.set_ylabel("Aptidão")
+                ax1.grid(True)
+
+                # Adicionar texto com o valor atual da aptidão e melhor global
+                ax1.text(
+                    0.02,
+                    0.95,
+                    f"Aptidão atual: {float(melhor_aptidao):.4f}\nMelhor aptidão: {float(melhor_aptidao_global):.4f}",
+                    transform=ax1.transAxes,
+                    fontsize=10,
+                    bbox=dict(facecolor="white", alpha=0.8),
+                )
 
-            # Ajustar layout e exibir
-            plt.tight_layout()
-            chart_container.pyplot(fig)
-            plt.close(fig)
+                # Gráfico de parâmetros
+                for param, valores in historico_parametros.items():
+                    ax2.plot(eixo_geracoes, valores, label=param)
+                ax2.set_title("Evolução dos Parâmetros")
+                ax2.set_xlabel("Geração")
+                ax2.set_ylabel("Valor")
+                ax2.legend()
+                ax2.grid(True)
+
+                # Adicionar texto com os valores atuais dos parâmetros
+                param_text = "\n".join(
+                    [f"{param}: {melhor_individuo[param]}" for param in melhor_individuo]
+                )
+                ax2.text(
+                    0.02,
+                    0.95,
+                    param_text,
+                    transform=ax2.transAxes,
+                    fontsize=9,
+                    bbox=dict(facecolor="white", alpha=0.8),
+                    verticalalignment="top",
+                )
 
-            # Processar a imagem com os melhores parâmetros e exibir apenas a cada 5 gerações ou na última
-            if geracao % 5 == 0 or geracao == geracoes - 1:
-                imagem_processada = processar_imagem(melhor_global, captcha_path)
-                if imagem_processada is not None:
-                    imagem_processada_rgb = cv2.cvtColor(
-                        imagem_processada, cv2.COLOR_BGR2RGB
-                    )
-                    image_container.image(
-                        imagem_processada_rgb,
-                        caption=f"Imagem Processada (Geração {geracao+1})",
-                        use_container_width=True,
+                # Ajustar layout e exibir
+                plt.tight_layout()
+                chart_container.pyplot(fig)
+                plt.close(fig)
+
+                # Processar a imagem com os melhores parâmetros e exibir apenas a cada 5 gerações ou na última
+                if geracao % 5 == 0 or geracao == geracoes - 1:
+                    imagem_processada = processar_imagem(melhor_global, captcha_path)
+                    if imagem_processada is not None:
+                        imagem_processada_rgb = cv2.cvtColor(
+                            imagem_processada, cv2.COLOR_BGR2RGB
+                        )
+                        image_container.image(
+                            imagem_processada_rgb,
+                            caption=f"Imagem Processada (Geração {geracao+1})",
+                            use_container_width=True,
+                        )
+
+                # Continuar o processamento
+                return True
+
+            # Executar o otimizador (a taxa de mutação só se aplica ao algoritmo genético)
+            opcoes = {}
+            if otimizador == "genetico":
+                opcoes = {
+                    "taxa_mutacao": taxa_mutacao,
+                    "eliminar_duplicados": eliminar_duplicados,
+                }
+            geracoes_captcha = geracoes
+            if anteriores:
+                # Aquecer a população; captchas já treinados fazem apenas um re-treino curto
+                sementes_populacao = selecionar_sementes_populacao(
+                    anteriores, captcha, captcha_path
+                )
+                # Fluxo próprio, derivado da semente do captcha, para que a
+                # população inicial não repita a sequência do otimizador
+                (semente_aquecimento,) = gerar_sementes(sementes[i], 1)
+                opcoes["populacao_inicial"] = criar_populacao_aquecida(
+                    sementes_populacao,
+                    tamanho_populacao,
+                    rng=random.Random(semente_aquecimento),
+                )
+                if any(r["captcha"] == captcha for r in anteriores):
+                    geracoes_captcha = min(geracoes, geracoes_incrementais)
+                    st.info(
+                        f"Re-treino incremental de {geracoes_captcha} gerações a partir de resultados anteriores."
                     )
-
-            # Continuar o processamento
-            return True
-
-        # Executar o algoritmo genético
-        melhor_individuo, melhor_aptidao, historico_aptidoes, historico_parametros = (
-            executar_algoritmo_genetico(
-                captcha_path,
-                target_path,
-                tamanho_populacao=tamanho_populacao,
-                geracoes=geracoes,
-                taxa_mutacao=taxa_mutacao,
-                callback=update_ui,
+            melhor_individuo, melhor_aptidao, historico_aptidoes, historico_parametros = (
+                criar_otimizador(
+                    otimizador,
+                    tamanho_populacao=tamanho_populacao,
+                    geracoes=geracoes_captcha,
+                    semente=sementes[i],
+                    **opcoes,
+                ).executar(
+                    captcha_path,
+                    target_path,
+                    callback=update_ui,
+                    limite_historico=limite_historico,
+                )
             )
-        )
-
-        # Processar a imagem com os melhores parâmetros
-        imagem_original = cv2.imread(captcha_path)
-        imagem_processada = processar_imagem(melhor_individuo, captcha_path)
 
-        if imagem_processada is not None:
-            # Salvar os resultados
-            resultado = salvar_resultados(
-                captcha,
-                melhor_individuo,
-                melhor_aptidao,
-                imagem_original,
-                imagem_processada,
-            )
-            resultados.append(resultado)
+            # Processar a imagem com os melhores parâmetros
+            imagem_original = cv2.imread(captcha_path)
+            imagem_processada = processar_imagem(melhor_individuo, captcha_path)
+
+            if imagem_processada is not None:
+                # Salvar os resultados
+                resultado = salvar_resultados(
+                    captcha,
+                    melhor_individuo,
+                    melhor_aptidao,
+                    imagem_original,
+                    imagem_processada,
+                    escritor=escritor,
+                )
+                resultados.append(resultado)
+                pares.append((captcha_path, target_path))
 
-            # Exibir o resultado final
-            st.success(f"Processamento concluído para {captcha}!")
+                # Exibir o resultado final
+                st.success(f"Processamento concluído para {captcha}!")
 
-            # Exibir informações detalhadas sobre o resultado
-            info_container_final = st.container()
-            with info_container_final:
+                # Exibir informações detalhadas sobre o resultado
+                info_container_final = st.container()
+                with info_container_final:
 
-                # Exibir os melhores parâmetros em formato de tabela para melhor visualização
-                st.write("**Melhores parâmetros:**")
+                    # Exibir os melhores parâmetros em formato de tabela para melhor visualização
+                    st.write("**Melhores parâmetros:**")
 
-                # Criar um DataFrame para exibir os parâmetros de forma mais organizada
-                params_df = pd.DataFrame(
-                    {
-                        "Parâmetro": list(melhor_individuo.keys()),
-                        "Valor": list(melhor_individuo.values()),
-                    }
-                )
-                st.table(params_df)
+                    # Criar um DataFrame para exibir os parâmetros de forma mais organizada
+                    params_df = pd.DataFrame(
+                        {
+                            "Parâmetro": list(melhor_individuo.keys()),
+                            "Valor": list(melhor_individuo.values()),
+                        }
+                    )
+                    st.table(params_df)
 
-                # Também exibir em formato JSON para compatibilidade
-                with st.expander("Ver parâmetros em formato JSON"):
-                    st.json(melhor_individuo)
+                    # Também exibir em formato JSON para compatibilidade
+                    with st.expander("Ver parâmetros em formato JSON"):
+                        st.json(melhor_individuo)
 
-                # Exibir informações sobre os arquivos salvos
-                st.write(
-                    f"**Imagem processada salva como:** {resultado['imagem_processada']}"
-                )
-                st.write(f"**Parâmetros salvos em:** {resultado['arquivo_parametros']}")
+                    # Exibir informações sobre os arquivos salvos
+                    st.write(
+                        f"**Imagem processada salva como:** {resultado['imagem_processada']}"
+                    )
+                    st.write(f"**Parâmetros salvos em:** {resultado['arquivo_parametros']}")
 
-        else:
-            st.error(f"Erro ao processar a imagem {captcha}!")
+            else:
+                st.error(f"Erro ao processar a imagem {captcha}!")
+    finally:
+        # Aguardar a gravação das imagens pendentes (também se a execução for
+        # interrompida)
+        escritor.encerrar()
+    for arquivo_erro, erro in escritor.erros:
+        st.error(f"Erro ao gravar {arquivo_erro}: {erro}")
 
     # Limpar a barra de progresso e o texto de status
     progress_bar.empty()
     status_text.empty()
 
-    # Calcular a média dos parâmetros se houver mais de um resultado
+    # Agregar os parâmetros se houver mais de um resultado
     params_media = None
-    if len(resultados) > 1:
+    if len(resultados) > 1 and agregacao == "robusta":
+        params_media, aptidao_media = agregar_parametros(resultados, pares)
+        st.info(
+            f"Parâmetros agregados com aptidão média de {aptidao_media:.4f} nos captchas de treino."
+        )
+    elif len(resultados) > 1:
         params_media = calcular_media_parametros(resultados)
 
     # Exibir resumo dos resultados
@@ -337,119 +506,217 @@ def processar_captchas_streamlit(
     return resultados, params_media
 
 
-def processar_samples_streamlit(params, limite_arquivos=None):
+def processar_samples_streamlit(
+    params,
+    limite_arquivos=None,
+    formato_saida="png",
+    compressao_png=3,
+    fragmentar=False,
+    calcular_metricas=True,
+    tamanho_lote_metricas=256,
+    limite_previas=20,
+):
     """
     Processa as imagens da pasta 'samples' usando os parâmetros fornecidos.
 
+    A memória usada não cresce com o número de imagens: a lista de arquivos
+    processados e as métricas são gravadas em CSV à medida que as imagens são
+    processadas, e apenas as primeiras `limite_previas` imagens são exibidas.
+
     Args:
         params: Dicionário com os parâmetros de processamento
         limite_arquivos: Limite de arquivos a processar (None para processar todos)
+        formato_saida: Formato dos arquivos gravados ("png", "webp" ou "bin")
+        compressao_png: Nível de compressão PNG (0–9)
+        fragmentar: Se True, distribui os arquivos em subpastas
+        calcular_metricas: Se True, calcula métricas de qualidade sem imagem
+            alvo para cada imagem e as grava em um CSV na pasta de resultados
+        tamanho_lote_metricas: Número de imagens por lote no cálculo das métricas
+        limite_previas: Número máximo de imagens exibidas na prévia
 
     Returns:
-        Lista de resultados do processamento
+        Dicionário com o número de imagens processadas ("processadas"), o CSV
+        com os arquivos processados ("arquivo_resultados") e, se calculadas, o
+        CSV e o resumo das métricas ("arquivo_metricas" e "metricas")
     """
     # Verificar se os parâmetros foram fornecidos
     if not params:
         st.error("Parâmetros não fornecidos!")
         return
 
+    import csv
+    import cv2
+    import pandas as pd
+    from processamento_imagem import processar_imagem, garantir_pasta_resultados
+    from escrita_resultados import EscritorAssincrono
+    from metricas_qualidade import calcular_metricas_lote, RegistroMetricas
+
     # Pasta de samples
     pasta_samples = "samples"
     pasta_samples_path = os.path.join(os.getcwd(), pasta_samples)
-    if not os.path.exists(pasta_samples_path):
+    indice = obter_indice(pasta_samples_path)
+    if not indice.existe:
         st.error(f"Pasta de samples não encontrada: {pasta_samples_path}")
         return
 
     # Garantir que a pasta de resultados exista
     pasta_resultados = garantir_pasta_resultados()
 
-    # Listar todos os arquivos .png e .jpg na pasta samples
-    arquivos_imagem = []
-    for arquivo in os.listdir(pasta_samples_path):
-        if arquivo.lower().endswith((".png", ".jpg")):
-            arquivos_imagem.append(arquivo)
-
-    # Limitar o número de arquivos se necessário
-    if limite_arquivos and len(arquivos_imagem) > limite_arquivos:
+    # Total de arquivos .png e .jpg na pasta samples, respeitando o limite
+    total = len(indice)
+    if limite_arquivos and total > limite_arquivos:
         st.write(
-            f"Limitando processamento a {limite_arquivos} arquivos de {len(arquivos_imagem)} encontrados."
+            f"Limitando processamento a {limite_arquivos} arquivos de {total} encontrados."
         )
-        arquivos_imagem = arquivos_imagem[:limite_arquivos]
+        total = limite_arquivos
 
     # Verificar se encontrou imagens
-    if not arquivos_imagem:
+    if not total:
         st.error(f"Nenhuma imagem encontrada na pasta {pasta_samples}!")
         return
 
-    st.write(f"Encontradas {len(arquivos_imagem)} imagens para processar.")
+    # Percorrer os arquivos em páginas, sem copiar a listagem inteira
+    arquivos_imagem = chain.from_iterable(indice.paginas(limite=total))
+
+    st.write(f"Encontradas {total} imagens para processar.")
     st.write(f"Usando os seguintes parâmetros:")
     st.json(params)
 
     # Processar cada imagem
-    resultados = []
+    processadas = 0
     progress_bar = st.progress(0)
     status_text = st.empty()
 
     # Criar colunas para exibir as imagens
     col1, col2 = st.columns(2)
 
-    for i, arquivo in enumerate(arquivos_imagem):
-        status_text.text(f"Processando imagem {i+1}/{len(arquivos_imagem)}: {arquivo}")
-
-        # Caminho completo para o arquivo
-        imagem_path = os.path.join(pasta_samples_path, arquivo)
+    # Gravar os resultados em segundo plano enquanto as imagens são processadas
+    escritor = EscritorAssincrono(
+        pasta_resultados,
+        formato=formato_saida,
+        compressao_png=compressao_png,
+        niveis_fragmentacao=1 if fragmentar else 0,
+    )
 
-        # Processar a imagem com os melhores parâmetros
-        imagem_processada = processar_imagem(params, imagem_path)
+    # Lista dos arquivos processados e métricas gravadas em CSV durante o processamento
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    caminho_lista = os.path.join(
+        pasta_resultados, f"resultados_samples_{timestamp}.csv"
+    )
+    arquivo_lista = open(caminho_lista, "w", newline="")
+    lista = csv.writer(arquivo_lista)
+    lista.writerow(["arquivo_original", "arquivo_processado"])
+    registro_metricas = None
+    if calcular_metricas:
+        registro_metricas = RegistroMetricas(
+            os.path.join(pasta_resultados, f"metricas_qualidade_{timestamp}.csv"),
+            limite_amostras=limite_previas,
+        )
 
-        if imagem_processada is not None:
-            # Nome base do arquivo (sem extensão)
-            nome_base = os.path.splitext(arquivo)[0]
+    # Imagens processadas aguardando o cálculo das métricas em lote
+    lote_imagens = []
+    lote_nomes = []
 
-            # Salvar a imagem processada na pasta de resultados
-            nome_arquivo_resultado = f"processado_{nome_base}.png"
-            caminho_resultado = os.path.join(pasta_resultados, nome_arquivo_resultado)
+    try:
+        for i, arquivo in enumerate(arquivos_imagem):
+            status_text.text(f"Processando imagem {i+1}/{total}: {arquivo}")
 
-            cv2.imwrite(caminho_resultado, imagem_processada)
-            st.success(f"Imagem processada salva como: {caminho_resultado}")
+            # Caminho completo para o arquivo
+            imagem_path = os.path.join(pasta_samples_path, arquivo)
 
-            resultados.append(
-                {
-                    "arquivo_original": arquivo,
-                    "arquivo_processado": nome_arquivo_resultado,
-                }
-            )
+            # Processar a imagem com os melhores parâmetros
+            imagem_processada = processar_imagem(params, imagem_path)
 
-            # Exibir as imagens original e processada
-            imagem_original = cv2.imread(imagem_path)
-            imagem_original_rgb = cv2.cvtColor(imagem_original, cv2.COLOR_BGR2RGB)
-            imagem_processada_rgb = cv2.cvtColor(imagem_processada, cv2.COLOR_BGR2RGB)
+            if imagem_processada is not None:
+                # Nome base do arquivo (sem extensão)
+                nome_base = os.path.splitext(arquivo)[0]
 
-            with col1:
-                st.image(
-                    imagem_original_rgb,
-                    caption=f"Original: {arquivo}",
-                    use_container_width=True,
-                )
-            with col2:
-                st.image(
-                    imagem_processada_rgb,
-                    caption=f"Processada: {nome_arquivo_resultado}",
-                    use_container_width=True,
+                # Salvar a imagem processada na pasta de resultados
+                nome_arquivo_resultado = escritor.escrever(
+                    f"processado_{nome_base}", imagem_processada
                 )
+                lista.writerow([arquivo, nome_arquivo_resultado])
+                processadas += 1
+
+                if registro_metricas is not None:
+                    lote_imagens.append(imagem_processada)
+                    lote_nomes.append(arquivo)
+                    if len(lote_imagens) >= tamanho_lote_metricas:
+                        registro_metricas.adicionar(
+                            calcular_metricas_lote(lote_imagens, lote_nomes)
+                        )
+                        lote_imagens, lote_nomes = [], []
+
+                # Exibir as imagens original e processada (apenas na prévia)
+                if processadas <= limite_previas:
+                    caminho_resultado = os.path.join(
+                        pasta_resultados, nome_arquivo_resultado
+                    )
+                    st.success(f"Imagem processada salva como: {caminho_resultado}")
+                    imagem_original_rgb = carregar_imagem_rgb(imagem_path)
+                    imagem_processada_rgb = cv2.cvtColor(
+                        imagem_processada, cv2.COLOR_BGR2RGB
+                    )
 
-        # Atualizar a barra de progresso
-        progress_bar.progress((i + 1) / len(arquivos_imagem))
+                    with col1:
+                        st.image(
+                            imagem_original_rgb,
+                            caption=f"Original: {arquivo}",
+                            use_container_width=True,
+                        )
+                    with col2:
+                        st.image(
+                            imagem_processada_rgb,
+                            caption=f"Processada: {nome_arquivo_resultado}",
+                            use_container_width=True,
+                        )
+
+            # Atualizar a barra de progresso
+            progress_bar.progress((i + 1) / total)
+
+        if lote_imagens:
+            registro_metricas.adicionar(
+                calcular_metricas_lote(lote_imagens, lote_nomes)
+            )
+    finally:
+        arquivo_lista.close()
+        if registro_metricas is not None:
+            registro_metricas.fechar()
+
+        # Aguardar a gravação das imagens pendentes
+        status_text.text("Gravando imagens pendentes...")
+        escritor.encerrar()
+    for arquivo_erro, erro in escritor.erros:
+        st.error(f"Erro ao gravar {arquivo_erro}: {erro}")
 
     # Limpar a barra de progresso e o texto de status
     progress_bar.empty()
     status_text.empty()
 
+    if processadas > limite_previas:
+        st.caption(
+            f"Prévia limitada às primeiras {limite_previas} imagens de {processadas}."
+        )
     st.success(
-        f"Processamento concluído! {len(resultados)} imagens processadas com sucesso."
+        f"Processamento concluído! {processadas} imagens processadas com sucesso."
     )
+    st.write(f"**Lista de arquivos processados:** {caminho_lista}")
+    resumo_execucao = {"processadas": processadas, "arquivo_resultados": caminho_lista}
+
+    # Métricas de qualidade sem imagem alvo
+    if registro_metricas is not None and registro_metricas.imagens:
+        resumo = registro_metricas.resumo()
+        st.subheader("Métricas de Qualidade")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Componentes = caracteres", f"{resumo['componentes_corretos']:.0%}")
+        col2.metric("Espessura média do traço", f"{resumo['espessura_media']:.1f} px")
+        col3.metric("Com linha residual", f"{resumo['com_linha_residual']:.0%}")
+        st.dataframe(pd.DataFrame(registro_metricas.amostras))
+        st.write(f"**Métricas salvas em:** {registro_metricas.caminho}")
+        resumo_execucao["arquivo_metricas"] = registro_metricas.caminho
+        resumo_execucao["metricas"] = resumo
 
-    return resultados
+    return resumo_execucao
 
 
 # Interface principal do Streamlit
@@ -502,40 +769,18 @@ def main():
         pasta_resultados = os.path.join(os.getcwd(), "resultados")
 
         with col1:
-            num_captchas = 0
-            if os.path.exists(pasta_imgs):
-                num_captchas = len(
-                    [
-                        f
-                        for f in os.listdir(pasta_imgs)
-                        if f.lower().endswith((".png", ".jpg"))
-                        and "target" not in f.lower()
-                    ]
-                )
+            num_captchas = len(obter_indice(pasta_imgs).captchas)
             st.metric("Captchas Disponíveis", num_captchas)
 
         with col2:
-            num_samples = 0
-            if os.path.exists(pasta_samples):
-                num_samples = len(
-                    [
-                        f
-                        for f in os.listdir(pasta_samples)
-                        if f.lower().endswith((".png", ".jpg"))
-                    ]
-                )
+            num_samples = len(obter_indice(pasta_samples))
             st.metric("Samples para Processar", num_samples)
 
         with col3:
-            num_resultados = 0
-            if os.path.exists(pasta_resultados):
-                num_resultados = len(
-                    [
-                        f
-                        for f in os.listdir(pasta_resultados)
-                        if f.startswith("processado_")
-                    ]
-                )
+            # Recursivo: os resultados podem estar em subpastas fragmentadas
+            num_resultados = obter_indice(
+                pasta_resultados, extensoes=None, recursivo=True
+            ).contar("processado_")
             st.metric("Resultados Gerados", num_resultados)
 
     elif opcao == "Aprender com Captchas":
@@ -547,6 +792,8 @@ def main():
         if resultados:
             # Salvar os parâmetros médios em um arquivo para uso posterior
             if params_media:
+                from processamento_imagem import garantir_pasta_resultados
+
                 pasta_resultados = garantir_pasta_resultados()
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 params_file = os.path.join(
@@ -592,6 +839,37 @@ def main():
             "erode_shape": erode_shape,
         }
 
+        # Processar uma imagem enviada diretamente, sem passar pelo disco
+        arquivo_enviado = st.file_uploader(
+            "Ou envie um captcha para processar com estes parâmetros",
+            type=["png", "jpg"],
+            key="samples_upload",
+        )
+        if arquivo_enviado is not None:
+            from processamento_imagem import processar_imagem_bytes
+
+            imagem_png = processar_imagem_bytes(params, arquivo_enviado.getvalue())
+            if imagem_png is not None:
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.image(
+                        arquivo_enviado.getvalue(),
+                        caption=f"Original: {arquivo_enviado.name}",
+                        use_container_width=True,
+                    )
+                with col2:
+                    st.image(
+                        imagem_png, caption="Processada", use_container_width=True
+                    )
+                st.download_button(
+                    "Baixar imagem processada",
+                    data=imagem_png,
+                    file_name=f"processado_{os.path.splitext(arquivo_enviado.name)[0]}.png",
+                    mime="image/png",
+                )
+            else:
+                st.error(f"Erro ao processar a imagem {arquivo_enviado.name}!")
+
         # Opção para limitar o número de arquivos
         limite = st.number_input(
             "Limite de arquivos a processar (0 para todos)", min_value=0, value=10
@@ -599,14 +877,60 @@ def main():
         if limite == 0:
             limite = None
 
+        # Opções de gravação dos resultados
+        from escrita_resultados import FORMATOS_SAIDA
+
+        with st.expander("Opções de gravação"):
+            formato_saida = st.selectbox(
+                "Formato de saída",
+                list(FORMATOS_SAIDA),
+                format_func=lambda f: {
+                    "png": "PNG",
+                    "webp": "WebP (sem perdas)",
+                    "bin": "Binário empacotado (1 bit por pixel)",
+                }[f],
+                key="samples_formato",
+            )
+            compressao_png = st.slider(
+                "Compressão PNG (0 = mais rápido, 9 = menor arquivo)",
+                0,
+                9,
+                3,
+                key="samples_compressao",
+                disabled=formato_saida != "png",
+            )
+            fragmentar = st.checkbox(
+                "Distribuir arquivos em subpastas", key="samples_fragmentar"
+            )
+            calcular_metricas = st.checkbox(
+                "Calcular métricas de qualidade (sem imagem alvo)",
+                value=True,
+                key="samples_metricas",
+            )
+            limite_previas = st.number_input(
+                "Imagens exibidas na prévia",
+                min_value=0,
+                value=20,
+                key="samples_previas",
+                help="As demais imagens são gravadas normalmente, sem exibição, para que lotes grandes não ocupem memória na interface.",
+            )
+
         # Botão para iniciar o processamento
         if st.button("Iniciar Processamento de Samples", key="samples_process_btn"):
-            processar_samples_streamlit(params, limite_arquivos=limite)
+            processar_samples_streamlit(
+                params,
+                limite_arquivos=limite,
+                formato_saida=formato_saida,
+                compressao_png=compressao_png,
+                fragmentar=fragmentar,
+                calcular_metricas=calcular_metricas,
+                limite_previas=limite_previas,
+            )
 
     elif opcao == "Fluxo Completo":
         st.header("Fluxo Completo: Aprender e Processar")
         st.write(
-            "Nesta etapa, o algoritmo genético aprende com os captchas e depois aplica os parâmetros médios às imagens da pasta 'samples'."
+            "Nesta etapa, o algoritmo genético aprende com os captchas e depois aplica os parâmetros agregados às imagens da pasta 'samples'."
         )
 
         # Configurações do algoritmo genético
@@ -621,6 +945,8 @@ def main():
         with col3:
             taxa_mut = st.slider("Taxa de Mutação", 0.0, 1.0, 0.2, key="fluxo_mut")
 
+        aquecer = st.checkbox("Aquecer com resultados anteriores", key="fluxo_aquecer")
+
         # Opção para limitar o número de arquivos
         limite = st.number_input(
             "Limite de arquivos a processar (0 para todos)", min_value=0, value=10
@@ -639,10 +965,11 @@ def main():
                     geracoes=num_geracoes,
                     taxa_mutacao=taxa_mut,
                     mostrar_config=False,
+                    aquecer=aquecer,
                 )
 
                 if resultados_captchas and params_media:
-                    # Usar os parâmetros médios para processar as imagens da pasta samples
+                    # Usar os parâmetros agregados para processar as imagens da pasta samples
                     st.success(
                         "Parâmetros ótimos encontrados! Processando imagens da pasta samples..."
                     )
@@ -674,8 +1001,8 @@ def main():
         
         O fluxo completo do aplicativo consiste em:
         1. Aprender os melhores parâmetros usando os 5 captchas de exemplo.
-        2. Calcular a média dos parâmetros encontrados.
-        3. Aplicar esses parâmetros médios às imagens da pasta 'samples'.
+        2. Agregar os parâmetros encontrados: os melhores de cada captcha, a média e a mediana são avaliados em todos os captchas e o melhor é refinado por busca local.
+        3. Aplicar esses parâmetros às imagens da pasta 'samples'.
         """
         )
 
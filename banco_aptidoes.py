@@ -0,0 +1,386 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from imagem_binaria import CacheLRU
+
+# Caminho padrão do banco de aptidões compartilhado entre execuções: a variável
+# de ambiente CAPTCHA_BANCO_APTIDOES ou a pasta "cache" ao lado dos módulos,
+# para que o banco não dependa do diretório de trabalho
+CAMINHO_BANCO_PADRAO = os.environ.get(
+    "CAPTCHA_BANCO_APTIDOES",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "cache", "aptidoes.sqlite"
+    ),
+)
+
+# Número máximo de aptidões guardadas; as usadas há mais tempo são descartadas
+LIMITE_REGISTROS_PADRAO = 1_000_000
+
+# Versão da avaliação: deve mudar quando o pipeline ou a similaridade mudarem,
+# para que aptidões antigas não sejam reaproveitadas
+VERSAO_AVALIACAO = 1
+
+# Intervalo mínimo (em segundos) entre duas atualizações da data de uso de um
+# registro, para que leituras repetidas não virem escritas
+INTERVALO_USO = 60.0
+
+# Número de inserções entre duas verificações do limite de registros
+INTERVALO_DESCARTE = 1000
+
+# Número máximo de parâmetros em uma consulta `IN (...)`
+TAMANHO_CONSULTA = 500
+
+# Hashes de conteúdo das imagens, por (caminho, data de modificação, tamanho)
+cache_hashes = CacheLRU(limite_bytes=1024 * 1024)
+
+
+def hash_arquivo(caminho):
+    """
+    Hash SHA-256 do conteúdo de um arquivo, calculado uma vez por versão do
+    arquivo (caminho, data de modificação e tamanho).
+
+    Args:
+        caminho: Caminho do arquivo
+
+    Returns:
+        Hash hexadecimal ou None se o arquivo não puder ser lido
+    """
+    try:
+        info = os.stat(caminho)
+    except OSError:
+        return None
+    chave = (os.path.abspath(caminho), info.st_mtime_ns, info.st_size)
+    resumo = cache_hashes.obter(chave)
+    if resumo is None:
+        try:
+            with open(caminho, "rb") as f:
+                resumo = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+        cache_hashes.guardar(chave, resumo, 128)
+    return resumo
+
+
+class BancoAptidoes:
+    """
+    Banco SQLite de aptidões, persistente entre execuções e processos.
+
+    Cada aptidão é identificada pelo hash do conteúdo da imagem e do alvo,
+    pela variante da avaliação (versão e uso da região de interesse) e pelos
+    valores dos parâmetros, então renomear ou copiar as imagens não invalida
+    os registros. O banco usa o modo WAL e um tempo de espera por bloqueio,
+    permitindo que vários processos leiam e gravem ao mesmo tempo.
+
+    As consultas e gravações são feitas por lote (uma consulta e uma
+    transação por população), e cada lote gravado fica imediatamente visível
+    para os outros processos. Quando o número de registros passa de
+    `limite_registros`, os usados há mais tempo são descartados. Erros do
+    banco (bloqueado, sem espaço ou fechado) nunca interrompem a avaliação:
+    as aptidões apenas deixam de ser lidas ou guardadas.
+    """
+
+    def __init__(
+        self,
+        caminho=CAMINHO_BANCO_PADRAO,
+        limite_registros=LIMITE_REGISTROS_PADRAO,
+        tempo_espera=30.0,
+    ):
+        """
+        Args:
+            caminho: Caminho do arquivo SQLite (criado se não existir)
+            limite_registros: Número máximo de aptidões guardadas
+            tempo_espera: Tempo máximo (em segundos) de espera por um bloqueio
+                de outro processo
+        """
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self.caminho = caminho
+        self.limite_registros = limite_registros
+        self.acertos = 0
+        self.falhas = 0
+        self._insercoes = 0
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(
+            caminho,
+            timeout=tempo_espera,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conexao.execute(f"PRAGMA busy_timeout = {int(tempo_espera * 1000)}")
+        self._conexao.execute("PRAGMA journal_mode = WAL")
+        self._conexao.execute("PRAGMA synchronous = NORMAL")
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS aptidoes (
+                imagem TEXT NOT NULL,
+                alvo TEXT NOT NULL,
+                variante TEXT NOT NULL,
+                parametros TEXT NOT NULL,
+                aptidao REAL NOT NULL,
+                usado REAL NOT NULL,
+                PRIMARY KEY (imagem, alvo, variante, parametros)
+            )
+            """)
+        self._conexao.execute(
+            "CREATE INDEX IF NOT EXISTS aptidoes_usado ON aptidoes (usado)"
+        )
+        with self._lock:
+            self._descartar_excedentes()
+
+    @staticmethod
+    def chaves(individuos, imagem_path, imagem_alvo_path, usar_roi=True):
+        """
+        Monta as chaves das avaliações de vários indivíduos no mesmo par de imagens.
+
+        Args:
+            individuos: Lista de dicionários com os parâmetros dos indivíduos
+            imagem_path: Caminho para a imagem a ser processada
+            imagem_alvo_path: Caminho para a imagem alvo
+            usar_roi: Se a avaliação usa a região de interesse
+
+        Returns:
+            Lista de tuplas (imagem, alvo, variante, parametros), ou None se
+            alguma das imagens não puder ser lida
+        """
+        imagem = hash_arquivo(imagem_path)
+        alvo = hash_arquivo(imagem_alvo_path)
+        if imagem is None or alvo is None:
+            return None
+        variante = f"v{VERSAO_AVALIACAO}-{'roi' if usar_roi else 'inteira'}"
+        return [
+            (
+                imagem,
+                alvo,
+                variante,
+                ",".join(f"{param}={individuo[param]}" for param in sorted(individuo)),
+            )
+            for individuo in individuos
+        ]
+
+    @staticmethod
+    def chave(individuo, imagem_path, imagem_alvo_path, usar_roi=True):
+        """
+        Monta a chave de uma avaliação (ver `chaves`), ou None se alguma das
+        imagens não puder ser lida.
+        """
+        chaves = BancoAptidoes.chaves(
+            [individuo], imagem_path, imagem_alvo_path, usar_roi
+        )
+        return chaves[0] if chaves else None
+
+    def obter_varios(self, chaves):
+        """
+        Busca as aptidões guardadas de várias chaves com uma consulta por par
+        de imagens.
+
+        Args:
+            chaves: Lista de chaves retornadas por `chaves`
+
+        Returns:
+            Dicionário chave -> aptidão com as chaves encontradas
+        """
+        grupos = {}
+        for chave in chaves:
+            grupos.setdefault(chave[:3], []).append(chave[3])
+
+        encontradas = {}
+        agora = time.time()
+        with self._lock:
+            if self._conexao is None:
+                # Banco fechado (`fechar`)
+                grupos = {}
+            for prefixo, parametros in grupos.items():
+                for inicio in range(0, len(parametros), TAMANHO_CONSULTA):
+                    bloco = parametros[inicio : inicio + TAMANHO_CONSULTA]
+                    marcadores = ",".join("?" * len(bloco))
+                    condicao = (
+                        "imagem = ? AND alvo = ? AND variante = ? "
+                        f"AND parametros IN ({marcadores})"
+                    )
+                    try:
+                        linhas = self._conexao.execute(
+                            f"SELECT parametros, aptidao, usado FROM aptidoes WHERE {condicao}",
+                            (*prefixo, *bloco),
+                        ).fetchall()
+                        # Atualizar a data de uso dos registros encontrados
+                        if any(agora - usado > INTERVALO_USO for _, _, usado in linhas):
+                            self._conexao.execute(
+                                f"UPDATE aptidoes SET usado = ? WHERE {condicao} "
+                                "AND usado < ?",
+                                (agora, *prefixo, *bloco, agora - INTERVALO_USO),
+                            )
+                    except sqlite3.Error:
+                        # Banco indisponível (bloqueado ou corrompido)
+                        linhas = []
+                    for parametro, aptidao, _ in linhas:
+                        encontradas[(*prefixo, parametro)] = aptidao
+            self.acertos += len(encontradas)
+            self.falhas += len(chaves) - len(encontradas)
+        return encontradas
+
+    def obter(self, chave):
+        """
+        Retorna a aptidão guardada para a chave ou None se não houver (ou se
+        o banco estiver indisponível).
+        """
+        return self.obter_varios([chave]).get(chave)
+
+    def guardar_varios(self, registros):
+        """
+        Guarda as aptidões de várias avaliações em uma única transação.
+
+        Args:
+            registros: Lista de tuplas (chave, aptidão)
+        """
+        if not registros:
+            return
+        agora = time.time()
+        with self._lock:
+            if self._conexao is None:
+                return
+            try:
+                self._conexao.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conexao.executemany(
+                        "INSERT OR REPLACE INTO aptidoes "
+                        "(imagem, alvo, variante, parametros, aptidao, usado) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [
+                            (*chave, float(aptidao), agora)
+                            for chave, aptidao in registros
+                        ],
+                    )
+                    self._conexao.execute("COMMIT")
+                except sqlite3.Error:
+                    self._conexao.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error:
+                # Um banco indisponível (bloqueado ou sem espaço) apenas deixa
+                # de guardar as aptidões
+                return
+
+            anteriores = self._insercoes
+            self._insercoes += len(registros)
+            if (
+                self._insercoes // INTERVALO_DESCARTE
+                != anteriores // INTERVALO_DESCARTE
+            ):
+                try:
+                    self._descartar_excedentes()
+                except sqlite3.Error:
+                    pass
+
+    def guardar(self, chave, aptidao):
+        """
+        Guarda a aptidão de uma avaliação.
+
+        Args:
+            chave: Chave retornada por `chave`
+            aptidao: Valor de aptidão
+        """
+        self.guardar_varios([(chave, aptidao)])
+
+    def descartar_excedentes(self):
+        """
+        Descarta os registros usados há mais tempo além do limite de registros.
+
+        Returns:
+            Número de registros descartados
+        """
+        with self._lock:
+            return self._descartar_excedentes()
+
+    def _descartar_excedentes(self):
+        if self._conexao is None:
+            return 0
+        total = self._conexao.execute("SELECT COUNT(*) FROM aptidoes").fetchone()[0]
+        excedentes = total - self.limite_registros
+        if excedentes <= 0:
+            return 0
+        self._conexao.execute(
+            "DELETE FROM aptidoes WHERE rowid IN "
+            "(SELECT rowid FROM aptidoes ORDER BY usado LIMIT ?)",
+            (excedentes,),
+        )
+        return excedentes
+
+    def limpar(self):
+        """
+        Remove todas as aptidões do banco.
+        """
+        with self._lock:
+            if self._conexao is not None:
+                try:
+                    self._conexao.execute("DELETE FROM aptidoes")
+                except sqlite3.Error:
+                    # Banco indisponível (bloqueado ou somente leitura): as
+                    # aptidões continuam no banco
+                    pass
+
+    def fechar(self):
+        """
+        Fecha a conexão com o banco. Chamadas posteriores não leem nem
+        guardam aptidões.
+        """
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
+
+    def __len__(self):
+        with self._lock:
+            if self._conexao is None:
+                return 0
+            return self._conexao.execute("SELECT COUNT(*) FROM aptidoes").fetchone()[0]
+
+
+# Banco usado automaticamente na avaliação (`avaliar_individuo` e `avaliar_populacao`)
+_configuracao_padrao = {
+    "caminho": CAMINHO_BANCO_PADRAO,
+    "limite_registros": LIMITE_REGISTROS_PADRAO,
+}
+_banco_padrao = None
+_lock_banco_padrao = threading.Lock()
+
+
+def configurar_banco_padrao(
+    caminho=CAMINHO_BANCO_PADRAO, limite_registros=LIMITE_REGISTROS_PADRAO
+):
+    """
+    Define o banco de aptidões usado automaticamente na avaliação.
+
+    Args:
+        caminho: Caminho do arquivo SQLite, ou None para desativar o banco
+        limite_registros: Número máximo de aptidões guardadas
+    """
+    global _banco_padrao
+    with _lock_banco_padrao:
+        if _banco_padrao is not None:
+            _banco_padrao.fechar()
+            _banco_padrao = None
+        _configuracao_padrao["caminho"] = caminho
+        _configuracao_padrao["limite_registros"] = limite_registros
+
+
+def obter_banco_padrao():
+    """
+    Retorna o banco de aptidões padrão, abrindo-o na primeira chamada.
+
+    Returns:
+        BancoAptidoes, ou None se o banco estiver desativado ou não puder ser
+        aberto (a avaliação continua sem o banco)
+    """
+    global _banco_padrao
+    if _banco_padrao is not None or _configuracao_padrao["caminho"] is None:
+        return _banco_padrao
+    with _lock_banco_padrao:
+        if _banco_padrao is None and _configuracao_padrao["caminho"] is not None:
+            try:
+                _banco_padrao = BancoAptidoes(**_configuracao_padrao)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Banco de aptidões desativado: {e}")
+                _configuracao_padrao["caminho"] = None
+        return _banco_padrao
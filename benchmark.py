@@ -0,0 +1,403 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from indice_dataset import obter_indice
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Configurações de mutação comparadas no benchmark
+CONFIGURACOES_MUTACAO = {
+    "uniforme (atual)": {},
+    "creep": {"operador_mutacao": "creep"},
+    "creep + linear": {"operador_mutacao": "creep", "agenda_mutacao": "linear"},
+    "creep + plato": {"operador_mutacao": "creep", "agenda_mutacao": "plato"},
+}
+
+# Configurações do modelo substituto comparadas no benchmark
+CONFIGURACOES_SUBSTITUTO = {
+    "sem substituto": {},
+    "substituto (50%)": {"substituto": True, "fracao_avaliada": 0.5},
+    "substituto (25%)": {"substituto": True, "fracao_avaliada": 0.25},
+}
+
+# Otimizadores comparados no benchmark
+CONFIGURACOES_OTIMIZADORES = {
+    "genetico": {"otimizador": "genetico"},
+    "genetico + substituto": {"otimizador": "genetico", "substituto": True},
+    "genetico sem duplicados": {
+        "otimizador": "genetico",
+        "eliminar_duplicados": True,
+    },
+    "tpe": {"otimizador": "tpe"},
+}
+
+# Orçamento de tempo (em segundos) da interface Streamlit
+ORCAMENTO_APP = {
+    "primeira_execucao": 1.0,
+    "reexecucao": 0.2,
+}
+
+# Páginas do app medidas no benchmark de inicialização
+PAGINAS_APP = [
+    "Home",
+    "Aprender com Captchas",
+    "Processar Samples",
+    "Fluxo Completo",
+    "Sobre o Algoritmo",
+]
+
+
+def listar_pares(pasta="imgs"):
+    """
+    Lista os pares (captcha, alvo) disponíveis em uma pasta.
+
+    Args:
+        pasta: Pasta com os captchas e os arquivos *_target.png
+
+    Returns:
+        Lista de tuplas (caminho do captcha, caminho do alvo)
+    """
+    return obter_indice(pasta).pares()
+
+
+def executar_com_historico(otimizador, captcha, alvo):
+    """
+    Executa um otimizador registrando o número acumulado de avaliações reais
+    (execuções do pipeline de imagem) e a melhor aptidão global a cada geração.
+
+    Args:
+        otimizador: Instância de Otimizador (já configurada com a semente)
+        captcha: Caminho do captcha
+        alvo: Caminho da imagem alvo
+
+    Returns:
+        Lista de tuplas (avaliações acumuladas, melhor aptidão global)
+    """
+    historico = []
+    avaliacoes = 0
+    for evento in otimizador.iterar(captcha, alvo):
+        avaliacoes += evento.avaliacoes_reais
+        historico.append((avaliacoes, evento.melhor_aptidao_global))
+    return historico
+
+
+def avaliacoes_ate_alvo(historico, aptidao_alvo):
+    """
+    Retorna o número de avaliações necessárias para atingir a aptidão alvo,
+    ou None se o alvo não foi atingido.
+    """
+    for avaliacoes, aptidao in historico:
+        if aptidao >= aptidao_alvo:
+            return avaliacoes
+    return None
+
+
+def comparar_configuracoes(configuracoes, pares, sementes, fracao_alvo=0.99, **kwargs):
+    """
+    Compara configurações pelo número de avaliações até a aptidão alvo.
+
+    A aptidão alvo de cada par é `fracao_alvo` vezes a melhor aptidão
+    encontrada por qualquer configuração e semente nesse par.
+
+    Args:
+        configuracoes: Dicionário nome -> argumentos do otimizador (a chave
+            "otimizador" escolhe o otimizador; padrão: "genetico")
+        pares: Lista de pares (captcha, alvo)
+        sementes: Lista de sementes usadas em cada configuração
+        fracao_alvo: Fração da melhor aptidão conhecida usada como alvo
+        **kwargs: Argumentos comuns a todas as configurações
+
+    Returns:
+        Dicionário nome -> {"avaliacoes": lista por execução (None se não atingiu),
+        "aptidao_final": lista por execução, "avaliacoes_totais": lista por execução}
+    """
+    from otimizadores import criar_otimizador
+
+    resumo = {
+        nome: {"avaliacoes": [], "aptidao_final": [], "avaliacoes_totais": []}
+        for nome in configuracoes
+    }
+
+    for captcha, alvo in pares:
+        historicos = {}
+        for nome, configuracao in configuracoes.items():
+            configuracao = dict(configuracao)
+            nome_otimizador = configuracao.pop("otimizador", "genetico")
+            historicos[nome] = [
+                executar_com_historico(
+                    criar_otimizador(
+                        nome_otimizador, semente=semente, **kwargs, **configuracao
+                    ),
+                    captcha,
+                    alvo,
+                )
+                for semente in sementes
+            ]
+
+        # Aptidão alvo relativa à melhor aptidão conhecida neste par
+        melhor = max(h[-1][1] for lista in historicos.values() for h in lista if h)
+        aptidao_alvo = fracao_alvo * melhor
+
+        for nome, lista in historicos.items():
+            for historico in lista:
+                resumo[nome]["avaliacoes"].append(
+                    avaliacoes_ate_alvo(historico, aptidao_alvo)
+                )
+                resumo[nome]["aptidao_final"].append(historico[-1][1])
+                resumo[nome]["avaliacoes_totais"].append(historico[-1][0])
+
+    return resumo
+
+
+def imprimir_resumo(resumo):
+    """
+    Imprime uma tabela com a mediana de avaliações até o alvo, a taxa de
+    sucesso e a aptidão final média de cada configuração.
+
+    Execuções que não atingiram o alvo contam como infinitas na mediana.
+    """
+    print(
+        f"{'Configuração':<24} {'Aval. (mediana)':>16} {'Sucesso':>9} "
+        f"{'Aptidão':>9} {'Aval. totais':>13}"
+    )
+    for nome, dados in resumo.items():
+        avaliacoes = [float("inf") if a is None else a for a in dados["avaliacoes"]]
+        mediana = statistics.median(avaliacoes)
+        mediana = f"{mediana:.0f}" if mediana != float("inf") else "não atingiu"
+        atingidos = sum(a is not None for a in dados["avaliacoes"])
+        sucesso = f"{atingidos}/{len(dados['avaliacoes'])}"
+        aptidao = statistics.mean(float(a) for a in dados["aptidao_final"])
+        totais = statistics.mean(dados["avaliacoes_totais"])
+        print(f"{nome:<24} {mediana:>16} {sucesso:>9} {aptidao:>9.4f} {totais:>13.0f}")
+
+
+def benchmark_mutacao(args):
+    """
+    Compara os operadores e agendas de mutação com o operador uniforme atual.
+    """
+    resumo = comparar_configuracoes(
+        CONFIGURACOES_MUTACAO,
+        listar_pares(args.pasta),
+        range(args.sementes),
+        fracao_alvo=args.fracao_alvo,
+        tamanho_populacao=args.populacao,
+        geracoes=args.geracoes,
+    )
+    imprimir_resumo(resumo)
+
+
+def benchmark_substituto(args):
+    """
+    Compara o algoritmo genético com e sem o modelo substituto, mostrando
+    quantas avaliações reais são economizadas para a mesma aptidão final.
+    """
+    resumo = comparar_configuracoes(
+        CONFIGURACOES_SUBSTITUTO,
+        listar_pares(args.pasta),
+        range(args.sementes),
+        fracao_alvo=args.fracao_alvo,
+        tamanho_populacao=args.populacao,
+        geracoes=args.geracoes,
+    )
+    imprimir_resumo(resumo)
+
+    # Economia de avaliações reais em relação à execução sem substituto
+    referencia = statistics.mean(resumo["sem substituto"]["avaliacoes_totais"])
+    for nome, dados in resumo.items():
+        if nome == "sem substituto":
+            continue
+        economia = 1 - statistics.mean(dados["avaliacoes_totais"]) / referencia
+        print(f"{nome}: {economia:.0%} menos avaliações reais")
+
+
+def benchmark_otimizadores(args):
+    """
+    Compara os otimizadores disponíveis com o mesmo orçamento de gerações.
+    """
+    resumo = comparar_configuracoes(
+        CONFIGURACOES_OTIMIZADORES,
+        listar_pares(args.pasta),
+        range(args.sementes),
+        fracao_alvo=args.fracao_alvo,
+        tamanho_populacao=args.populacao,
+        geracoes=args.geracoes,
+    )
+    imprimir_resumo(resumo)
+
+
+def medir_app(script="app_streamlit.py", repeticoes=5):
+    """
+    Mede o tempo da primeira execução do app e das reexecuções de cada página.
+
+    A primeira execução inclui a importação dos módulos do projeto; as
+    reexecuções simulam a troca de página no menu lateral, que no Streamlit
+    reexecuta o script inteiro.
+
+    Args:
+        script: Caminho do script Streamlit
+        repeticoes: Número de reexecuções medidas por página
+
+    Returns:
+        Dicionário com "primeira_execucao" (segundos) e "reexecucao"
+        (dicionário página -> mediana das reexecuções em segundos)
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(os.path.abspath(script), default_timeout=60)
+    inicio = time.perf_counter()
+    app.run()
+    primeira_execucao = time.perf_counter() - inicio
+
+    reexecucao = {}
+    for pagina in PAGINAS_APP:
+        app.sidebar.radio[0].set_value(pagina)
+        app.run()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            app.run()
+            tempos.append(time.perf_counter() - inicio)
+        if app.exception:
+            raise RuntimeError(f"Erro na página {pagina}: {app.exception[0].message}")
+        reexecucao[pagina] = statistics.median(tempos)
+
+    return {"primeira_execucao": primeira_execucao, "reexecucao": reexecucao}
+
+
+def pico_memoria_mb():
+    """
+    Pico de memória residente (RSS) do processo em MB, ou None se não for
+    possível medi-lo nesta plataforma.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é medido em bytes no macOS e em kB nos demais sistemas
+    return pico / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def formatar_pico_memoria():
+    """
+    Pico de memória formatado para as tabelas, ou "n/d" se não for possível
+    medi-lo nesta plataforma.
+    """
+    pico = pico_memoria_mb()
+    return f"{pico:>8.1f} MB" if pico is not None else f"{'n/d':>11}"
+
+
+def benchmark_memoria(args):
+    """
+    Mede o pico de memória ao processar os samples repetidas vezes, em
+    páginas, com as métricas gravadas em streaming (como no app). Com a
+    memória limitada, o pico fica estável à medida que o número de imagens
+    processadas cresce.
+    """
+    from algoritmo_genetico import executar_algoritmo_genetico
+    from metricas_qualidade import RegistroMetricas, calcular_metricas_lote
+    from processamento_imagem import processar_imagem
+    from servidor_api import PARAMETROS_PADRAO
+
+    indice = obter_indice(args.pasta_samples)
+    if not len(indice):
+        sys.exit(f"Nenhuma imagem encontrada em {args.pasta_samples}")
+
+    print(f"{'Etapa':<28} {'Imagens':>9} {'Pico RSS':>11}")
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "metricas.csv")
+        with RegistroMetricas(caminho) as registro:
+            for passe in range(args.passes):
+                for pagina in indice.paginas(tamanho=256):
+                    imagens = [
+                        processar_imagem(PARAMETROS_PADRAO, indice.caminho(nome))
+                        for nome in pagina
+                    ]
+                    registro.adicionar(calcular_metricas_lote(imagens, pagina))
+                print(
+                    f"{f'samples (passe {passe + 1})':<28} {registro.imagens:>9} "
+                    f"{formatar_pico_memoria()}"
+                )
+
+    # Algoritmo genético longo com histórico em buffer circular
+    captcha, alvo = listar_pares(args.pasta)[0]
+    executar_algoritmo_genetico(
+        captcha,
+        alvo,
+        tamanho_populacao=args.populacao,
+        geracoes=args.geracoes,
+        semente=0,
+        limite_historico=args.limite_historico,
+    )
+    print(f"{'algoritmo genético':<28} {'-':>9} {formatar_pico_memoria()}")
+
+
+def benchmark_app(args):
+    """
+    Verifica se a inicialização e as reexecuções do app cabem no orçamento.
+    """
+    tempos = medir_app()
+    dentro = True
+
+    def linha(nome, tempo, limite):
+        situacao = "ok" if tempo <= limite else "ACIMA"
+        print(
+            f"{nome:<28} {tempo * 1000:>8.0f} ms {limite * 1000:>8.0f} ms  {situacao}"
+        )
+        return tempo <= limite
+
+    print(f"{'Etapa':<28} {'Tempo':>11} {'Orçamento':>11}")
+    dentro &= linha(
+        "primeira execução",
+        tempos["primeira_execucao"],
+        ORCAMENTO_APP["primeira_execucao"],
+    )
+    for pagina, tempo in tempos["reexecucao"].items():
+        dentro &= linha(pagina, tempo, ORCAMENTO_APP["reexecucao"])
+    if not dentro:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do otimizador de captchas.")
+    parser.add_argument("--pasta", default="imgs")
+    parser.add_argument("--sementes", type=int, default=5)
+    parser.add_argument("--populacao", type=int, default=20)
+    parser.add_argument("--geracoes", type=int, default=50)
+    parser.add_argument("--fracao-alvo", type=float, default=0.99)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    subparsers.add_parser(
+        "mutacao", help="Avaliações até a aptidão alvo por operador de mutação"
+    ).set_defaults(funcao=benchmark_mutacao)
+    subparsers.add_parser(
+        "substituto", help="Avaliações reais economizadas pelo modelo substituto"
+    ).set_defaults(funcao=benchmark_substituto)
+    subparsers.add_parser(
+        "otimizadores", help="Avaliações até a aptidão alvo por otimizador"
+    ).set_defaults(funcao=benchmark_otimizadores)
+    subparsers.add_parser(
+        "app", help="Tempo de inicialização e reexecução do app Streamlit"
+    ).set_defaults(funcao=benchmark_app)
+    memoria = subparsers.add_parser(
+        "memoria", help="Pico de memória no processamento de lotes grandes"
+    )
+    memoria.add_argument("--pasta-samples", default="samples")
+    memoria.add_argument("--passes", type=int, default=5)
+    memoria.add_argument("--limite-historico", type=int, default=100)
+    memoria.set_defaults(funcao=benchmark_memoria)
+
+    args = parser.parse_args()
+    args.funcao(args)
+
+    pico = pico_memoria_mb()
+    if pico is not None:
+        print(f"Pico de memória (RSS): {pico:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import queue
+import threading
+
+from processamento_imagem import codificar_imagem
+
+
+# Formatos de saída suportados e suas extensões
+FORMATOS_SAIDA = {
+    "png": ".png",
+    "webp": ".webp",
+    "bin": ".bin",
+}
+
+
+def caminho_fragmentado(nome_arquivo, niveis=1):
+    """
+    Calcula o caminho relativo de um arquivo em subpastas fragmentadas.
+
+    Cada nível usa dois caracteres hexadecimais do hash do nome, o que
+    distribui os arquivos em até 256 subpastas por nível.
+
+    Args:
+        nome_arquivo: Nome do arquivo de saída
+        niveis: Número de níveis de subpastas (0 para não fragmentar)
+
+    Returns:
+        Caminho relativo (ex.: "a3/processado_2b827.png")
+    """
+    if niveis <= 0:
+        return nome_arquivo
+    resumo = hashlib.md5(nome_arquivo.encode("utf-8")).hexdigest()
+    partes = [resumo[2 * i : 2 * i + 2] for i in range(niveis)]
+    return os.path.join(*partes, nome_arquivo)
+
+
+class EscritorAssincrono:
+    """
+    Grava imagens em disco em threads separadas, com uma fila limitada.
+
+    A codificação (PNG/WebP/binário) e a escrita acontecem nas threads de
+    escrita; quando a fila está cheia, `escrever` bloqueia até haver espaço,
+    limitando a memória ocupada por imagens pendentes.
+    """
+
+    def __init__(
+        self,
+        pasta,
+        formato="png",
+        compressao_png=3,
+        trabalhadores=2,
+        tamanho_fila=64,
+        niveis_fragmentacao=0,
+    ):
+        """
+        Args:
+            pasta: Pasta de destino dos arquivos
+            formato: "png", "webp" (sem perdas) ou "bin" (binário empacotado)
+            compressao_png: Nível de compressão PNG (0–9)
+            trabalhadores: Número de threads de escrita
+            tamanho_fila: Número máximo de imagens aguardando gravação
+            niveis_fragmentacao: Níveis de subpastas para distribuir os arquivos
+        """
+        if formato not in FORMATOS_SAIDA:
+            raise ValueError(
+                f"Formato inválido: {formato}. Use um de: {', '.join(FORMATOS_SAIDA)}"
+            )
+        self.pasta = pasta
+        self.formato = formato
+        self.extensao = FORMATOS_SAIDA[formato]
+        self.compressao_png = compressao_png
+        self.niveis_fragmentacao = niveis_fragmentacao
+        self.gravados = 0
+        self.erros = []
+
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._lock = threading.Lock()
+        self._pastas_criadas = set()
+        self._threads = [
+            threading.Thread(target=self._trabalhar, name=f"escritor-{i}", daemon=True)
+            for i in range(trabalhadores)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+    def escrever(self, nome_base, imagem):
+        """
+        Enfileira uma imagem para gravação.
+
+        Args:
+            nome_base: Nome do arquivo sem extensão
+            imagem: Imagem a ser gravada
+
+        Returns:
+            Caminho relativo à pasta de destino onde a imagem será gravada
+        """
+        relativo = caminho_fragmentado(
+            nome_base + self.extensao, self.niveis_fragmentacao
+        )
+        self._fila.put((relativo, imagem))
+        return relativo
+
+    def _garantir_pasta(self, caminho):
+        pasta = os.path.dirname(caminho)
+        if pasta in self._pastas_criadas:
+            return
+        os.makedirs(pasta, exist_ok=True)
+        with self._lock:
+            self._pastas_criadas.add(pasta)
+
+    def _trabalhar(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            relativo, imagem = item
+            caminho = os.path.join(self.pasta, relativo)
+            try:
+                dados = codificar_imagem(
+                    imagem, formato=self.extensao, compressao_png=self.compressao_png
+                )
+                if dados is None:
+                    raise ValueError("falha ao codificar a imagem")
+                self._garantir_pasta(caminho)
+                with open(caminho, "wb") as f:
+                    f.write(dados)
+                with self._lock:
+                    self.gravados += 1
+            except Exception as e:
+                with self._lock:
+                    self.erros.append((relativo, str(e)))
+
+    def encerrar(self):
+        """
+        Aguarda a gravação de todas as imagens pendentes e encerra as threads.
+
+        Returns:
+            Número de imagens gravadas com sucesso
+        """
+        for _ in self._threads:
+            self._fila.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        return self.gravados
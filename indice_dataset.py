@@ -0,0 +1,219 @@
+import os
+import threading
+
+# Extensões consideradas imagens de captcha
+EXTENSOES_IMAGEM = (".png", ".jpg")
+
+# Sufixo do nome base das imagens alvo (ex.: "captcha1_target.png")
+SUFIXO_ALVO = "_target"
+
+
+class IndiceDataset:
+    """
+    Índice dos arquivos de uma pasta de captchas, montado com uma única
+    varredura (`os.scandir`).
+
+    Separa os captchas das imagens alvo (`<nome>_target.png`) e associa cada
+    captcha ao seu alvo. Os nomes ficam ordenados, o que permite percorrer
+    pastas muito grandes em páginas sem montar novas listas. No modo
+    recursivo (pastas fragmentadas por `EscritorAssincrono`), os nomes são
+    caminhos relativos à pasta.
+    """
+
+    def __init__(self, pasta, extensoes=EXTENSOES_IMAGEM, recursivo=False):
+        """
+        Args:
+            pasta: Pasta a ser indexada
+            extensoes: Extensões dos arquivos indexados (None para todos os arquivos)
+            recursivo: Se True, indexa também os arquivos das subpastas
+        """
+        self.pasta = pasta
+        self.extensoes = extensoes
+        self.recursivo = recursivo
+        self.modificacao = None
+        self.subpastas = []
+        self.arquivos = []
+        self.captchas = []
+        self.alvos = {}
+        self.escanear()
+
+    def escanear(self):
+        """
+        Varre a pasta e reconstrói o índice.
+        """
+        try:
+            datas = {"": os.stat(self.pasta).st_mtime_ns}
+        except OSError:
+            self.modificacao = None
+            self.subpastas = []
+            self.arquivos, self.captchas, self.alvos = [], [], {}
+            return
+
+        # As datas de modificação são lidas antes de cada varredura, então
+        # arquivos criados durante a varredura provocam uma nova varredura
+        arquivos = []
+        pendentes = [""]
+        while pendentes:
+            relativa = pendentes.pop()
+            try:
+                entradas = os.scandir(os.path.join(self.pasta, relativa))
+            except OSError:
+                # Subpasta removida durante a varredura (a pasta principal
+                # continua sendo lida normalmente)
+                if not relativa:
+                    raise
+                del datas[relativa]
+                continue
+            with entradas:
+                for entrada in entradas:
+                    nome = os.path.join(relativa, entrada.name)
+                    # Links simbólicos para pastas não são seguidos, o que
+                    # evita ciclos na varredura recursiva
+                    if self.recursivo and entrada.is_dir(follow_symlinks=False):
+                        try:
+                            datas[nome] = entrada.stat().st_mtime_ns
+                        except OSError:
+                            continue
+                        pendentes.append(nome)
+                        continue
+                    if self.extensoes and not nome.lower().endswith(self.extensoes):
+                        continue
+                    if entrada.is_file():
+                        arquivos.append(nome)
+        arquivos.sort()
+        self.subpastas = sorted(datas)[1:]
+        self.modificacao = tuple(datas[relativa] for relativa in ["", *self.subpastas])
+
+        captchas = []
+        alvos = {}
+        for nome in arquivos:
+            nome_base = os.path.splitext(nome)[0]
+            if nome_base.lower().endswith(SUFIXO_ALVO):
+                alvos[nome_base[: -len(SUFIXO_ALVO)]] = nome
+            else:
+                captchas.append(nome)
+
+        self.arquivos = arquivos
+        self.captchas = captchas
+        self.alvos = alvos
+
+    def modificacao_atual(self):
+        """
+        Datas de modificação da pasta e das subpastas indexadas, que mudam
+        quando arquivos são criados, removidos ou renomeados nelas.
+
+        Returns:
+            Tupla de datas (None para subpastas que não existem mais), ou None
+            se a pasta não existir
+        """
+        datas = []
+        for relativa in ["", *self.subpastas]:
+            try:
+                datas.append(os.stat(os.path.join(self.pasta, relativa)).st_mtime_ns)
+            except OSError:
+                if not relativa:
+                    return None
+                datas.append(None)
+        return tuple(datas)
+
+    def __len__(self):
+        return len(self.arquivos)
+
+    @property
+    def existe(self):
+        return self.modificacao is not None
+
+    def caminho(self, nome):
+        """
+        Caminho completo de um arquivo da pasta.
+        """
+        return os.path.join(self.pasta, nome)
+
+    def alvo(self, captcha):
+        """
+        Caminho da imagem alvo de um captcha, ou None se não houver.
+        """
+        nome_alvo = self.alvos.get(os.path.splitext(captcha)[0])
+        return self.caminho(nome_alvo) if nome_alvo else None
+
+    def pares(self):
+        """
+        Lista os pares (caminho do captcha, caminho do alvo) da pasta.
+        """
+        return [
+            (self.caminho(captcha), self.alvo(captcha))
+            for captcha in self.captchas
+            if self.alvo(captcha)
+        ]
+
+    def contar(self, prefixo=""):
+        """
+        Conta os arquivos indexados cujo nome (sem a subpasta) começa com `prefixo`.
+        """
+        if not prefixo:
+            return len(self.arquivos)
+        return sum(
+            1 for nome in self.arquivos if os.path.basename(nome).startswith(prefixo)
+        )
+
+    def pagina(self, numero, tamanho=100, apenas_captchas=False):
+        """
+        Retorna uma página de nomes de arquivos.
+
+        Args:
+            numero: Número da página (a partir de 0)
+            tamanho: Número de arquivos por página
+            apenas_captchas: Se True, pagina apenas os captchas (sem os alvos)
+
+        Returns:
+            Lista com os nomes dos arquivos da página
+        """
+        nomes = self.captchas if apenas_captchas else self.arquivos
+        return nomes[numero * tamanho : (numero + 1) * tamanho]
+
+    def paginas(self, tamanho=1000, limite=None, apenas_captchas=False):
+        """
+        Percorre os nomes dos arquivos em páginas.
+
+        Args:
+            tamanho: Número de arquivos por página
+            limite: Número máximo de arquivos percorridos (None para todos)
+            apenas_captchas: Se True, percorre apenas os captchas (sem os alvos)
+
+        Yields:
+            Listas com os nomes dos arquivos de cada página
+        """
+        nomes = self.captchas if apenas_captchas else self.arquivos
+        total = len(nomes) if limite is None else min(limite, len(nomes))
+        for inicio in range(0, total, tamanho):
+            yield nomes[inicio : min(inicio + tamanho, total)]
+
+
+# Índices já montados, por (pasta, extensões, recursivo)
+_indices = {}
+_lock_indices = threading.Lock()
+
+
+def obter_indice(pasta, extensoes=EXTENSOES_IMAGEM, recursivo=False):
+    """
+    Retorna o índice de uma pasta, varrendo-a novamente apenas quando a data
+    de modificação da pasta (ou de uma subpasta indexada) muda (arquivos
+    criados, removidos ou renomeados).
+
+    Args:
+        pasta: Pasta a ser indexada
+        extensoes: Extensões dos arquivos indexados (None para todos os arquivos)
+        recursivo: Se True, indexa também os arquivos das subpastas
+
+    Returns:
+        IndiceDataset da pasta (vazio se a pasta não existir)
+    """
+    chave = (os.path.abspath(pasta), extensoes, recursivo)
+    with _lock_indices:
+        indice = _indices.get(chave)
+        if indice is None:
+            indice = IndiceDataset(pasta, extensoes, recursivo)
+            _indices[chave] = indice
+        elif indice.modificacao != indice.modificacao_atual():
+            indice.escanear()
+        return indice
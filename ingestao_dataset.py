@@ -0,0 +1,320 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from indice_dataset import EXTENSOES_IMAGEM
+from processamento_imagem import decodificar_imagem, processar_imagem_array
+
+# Nome do manifesto gravado na pasta de destino
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+# Versão do formato dos fragmentos e do manifesto
+VERSAO_MANIFESTO = 1
+
+
+def hash_conteudo(dados):
+    """
+    Hash SHA-256 (hexadecimal) do conteúdo de um arquivo.
+    """
+    return hashlib.sha256(dados).hexdigest()
+
+
+def listar_arquivos_imagem(origem):
+    """
+    Lista recursivamente as imagens de uma pasta.
+
+    Args:
+        origem: Pasta com as imagens (por exemplo, a pasta baixada do Kaggle)
+
+    Returns:
+        Lista ordenada de caminhos relativos a `origem`
+    """
+    arquivos = []
+    pendentes = [origem]
+    while pendentes:
+        with os.scandir(pendentes.pop()) as entradas:
+            for entrada in entradas:
+                if entrada.is_dir():
+                    pendentes.append(entrada.path)
+                elif entrada.name.lower().endswith(EXTENSOES_IMAGEM):
+                    arquivos.append(os.path.relpath(entrada.path, origem))
+    return sorted(arquivos)
+
+
+def _ler_imagem(caminho, tamanho_minimo, ja_ingeridos):
+    """
+    Lê, valida e decodifica uma imagem.
+
+    Returns:
+        Tupla (hash, imagem, erro); `erro` descreve o motivo quando a imagem é
+        inválida, e `imagem` é None também quando o hash já foi ingerido (a
+        imagem não é decodificada)
+    """
+    try:
+        with open(caminho, "rb") as f:
+            dados = f.read()
+    except OSError as e:
+        return None, None, f"erro de leitura: {e}"
+
+    resumo = hash_conteudo(dados)
+    if resumo in ja_ingeridos:
+        return resumo, None, None
+    imagem = decodificar_imagem(dados)
+    if imagem is None:
+        return resumo, None, "não foi possível decodificar"
+    if min(imagem.shape[:2]) < tamanho_minimo:
+        return (
+            resumo,
+            None,
+            f"imagem muito pequena: {imagem.shape[1]}x{imagem.shape[0]}",
+        )
+
+    # Armazenar um único canal quando os canais forem idênticos
+    if imagem.ndim == 3 and (imagem == imagem[:, :, :1]).all():
+        imagem = np.ascontiguousarray(imagem[:, :, 0])
+    return resumo, imagem, None
+
+
+def carregar_manifesto(destino):
+    """
+    Carrega o manifesto de uma pasta de dataset ingerido.
+
+    Args:
+        destino: Pasta com os fragmentos e o manifesto
+
+    Returns:
+        Dicionário do manifesto, ou um manifesto vazio se ainda não existir
+    """
+    caminho = os.path.join(destino, ARQUIVO_MANIFESTO)
+    if not os.path.isfile(caminho):
+        return {
+            "versao": VERSAO_MANIFESTO,
+            "fragmentos": [],
+            "hashes": {},
+            "duplicados": {},
+            "invalidos": {},
+        }
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _salvar_manifesto(manifesto, destino):
+    # Gravar em um arquivo temporário e renomear, para não deixar o
+    # manifesto pela metade se a ingestão for interrompida
+    caminho = os.path.join(destino, ARQUIVO_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=1)
+    os.replace(temporario, caminho)
+
+
+def _gravar_fragmento(manifesto, destino, nomes, hashes, imagens):
+    """
+    Grava um fragmento .npz com imagens do mesmo formato e o registra no manifesto.
+    """
+    numero = len(manifesto["fragmentos"])
+    arquivo = f"fragmento_{numero:05d}.npz"
+    np.savez_compressed(
+        os.path.join(destino, arquivo),
+        imagens=np.stack(imagens),
+        nomes=np.array(nomes),
+        hashes=np.array(hashes),
+    )
+    manifesto["fragmentos"].append(
+        {
+            "arquivo": arquivo,
+            "imagens": len(imagens),
+            "formato": list(imagens[0].shape),
+        }
+    )
+
+
+def ingerir_pasta(
+    origem,
+    destino="dataset",
+    tamanho_fragmento=512,
+    trabalhadores=4,
+    tamanho_minimo=8,
+):
+    """
+    Ingere uma pasta local de captchas em fragmentos prontos para processamento.
+
+    As imagens são validadas (decodificáveis e com tamanho mínimo),
+    deduplicadas pelo hash SHA-256 do conteúdo e decodificadas em paralelo.
+    Imagens com o mesmo formato são empilhadas em fragmentos .npz de até
+    `tamanho_fragmento` imagens (em tons de cinza quando os canais são
+    idênticos), que podem ser processados de forma independente.
+
+    A ingestão é incremental: imagens cujo hash já está no manifesto da pasta
+    de destino não são decodificadas novamente, e as novas imagens vão para
+    novos fragmentos.
+
+    Args:
+        origem: Pasta com as imagens (percorrida recursivamente)
+        destino: Pasta onde os fragmentos e o manifesto são gravados
+        tamanho_fragmento: Número máximo de imagens por fragmento
+        trabalhadores: Número de threads de leitura e decodificação
+        tamanho_minimo: Altura e largura mínimas de uma imagem válida
+
+    Returns:
+        Dicionário com o resumo da ingestão: "novas", "ja_ingeridas",
+        "duplicadas", "invalidas" e "fragmentos" (fragmentos gravados)
+    """
+    os.makedirs(destino, exist_ok=True)
+    manifesto = carregar_manifesto(destino)
+    conhecidos = manifesto["hashes"]
+    ja_ingeridos = frozenset(conhecidos)
+    fragmentos_anteriores = len(manifesto["fragmentos"])
+    resumo = {"novas": 0, "ja_ingeridas": 0, "duplicadas": 0, "invalidas": 0}
+
+    # Imagens pendentes agrupadas por formato até completar um fragmento
+    pendentes = {}
+
+    arquivos = listar_arquivos_imagem(origem)
+    bloco = max(1, tamanho_fragmento * trabalhadores)
+    with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+        # Ler em blocos para limitar a memória ocupada por imagens decodificadas
+        for inicio in range(0, len(arquivos), bloco):
+            nomes = arquivos[inicio : inicio + bloco]
+            lidos = executor.map(
+                lambda nome: _ler_imagem(
+                    os.path.join(origem, nome), tamanho_minimo, ja_ingeridos
+                ),
+                nomes,
+            )
+            # Consolidar na ordem dos arquivos (resultado determinístico)
+            for nome, (resumo_hash, imagem, erro) in zip(nomes, lidos):
+                if erro is not None:
+                    manifesto["invalidos"][nome] = erro
+                    resumo["invalidas"] += 1
+                    continue
+                if resumo_hash in conhecidos:
+                    if conhecidos[resumo_hash] == nome:
+                        resumo["ja_ingeridas"] += 1
+                    else:
+                        manifesto["duplicados"][nome] = conhecidos[resumo_hash]
+                        resumo["duplicadas"] += 1
+                    continue
+                conhecidos[resumo_hash] = nome
+                resumo["novas"] += 1
+
+                grupo = pendentes.setdefault(imagem.shape, ([], [], []))
+                grupo[0].append(nome)
+                grupo[1].append(resumo_hash)
+                grupo[2].append(imagem)
+                if len(grupo[0]) >= tamanho_fragmento:
+                    _gravar_fragmento(manifesto, destino, *grupo)
+                    del pendentes[imagem.shape]
+
+    # Gravar os fragmentos incompletos
+    for grupo in pendentes.values():
+        _gravar_fragmento(manifesto, destino, *grupo)
+
+    manifesto["origem"] = os.path.abspath(origem)
+    _salvar_manifesto(manifesto, destino)
+    resumo["fragmentos"] = len(manifesto["fragmentos"]) - fragmentos_anteriores
+    return resumo
+
+
+def carregar_fragmento(caminho, bgr=True):
+    """
+    Carrega as imagens de um fragmento.
+
+    Args:
+        caminho: Caminho do arquivo .npz do fragmento
+        bgr: Se True, converte imagens em tons de cinza para BGR (mesmo formato
+            de `carregar_imagem`)
+
+    Returns:
+        Tupla (nomes, imagens) com a lista de nomes relativos e o array de imagens
+    """
+    with np.load(caminho) as dados:
+        nomes = [str(nome) for nome in dados["nomes"]]
+        imagens = dados["imagens"]
+    if bgr and imagens.ndim == 3:
+        imagens = np.repeat(imagens[..., None], 3, axis=3)
+    return nomes, imagens
+
+
+def processar_fragmento(params, caminho):
+    """
+    Aplica o pipeline de processamento a todas as imagens de um fragmento.
+
+    Args:
+        params: Dicionário com os parâmetros de processamento
+        caminho: Caminho do arquivo .npz do fragmento
+
+    Returns:
+        Tupla (nomes, imagens processadas)
+    """
+    nomes, imagens = carregar_fragmento(caminho, bgr=False)
+    return nomes, [processar_imagem_array(params, imagem) for imagem in imagens]
+
+
+def caminhos_fragmentos(destino="dataset"):
+    """
+    Lista os caminhos dos fragmentos registrados no manifesto.
+    """
+    return [
+        os.path.join(destino, fragmento["arquivo"])
+        for fragmento in carregar_manifesto(destino)["fragmentos"]
+    ]
+
+
+def criar_parser(descricao):
+    """
+    Cria o parser de linha de comando com as opções comuns de ingestão
+    (destino, tamanho dos fragmentos e trabalhadores).
+
+    Args:
+        descricao: Descrição exibida na ajuda do comando
+
+    Returns:
+        argparse.ArgumentParser (a origem é acrescentada por quem o usa)
+    """
+    parser = argparse.ArgumentParser(description=descricao)
+    parser.add_argument("--destino", default="dataset")
+    parser.add_argument("--tamanho-fragmento", type=int, default=512)
+    parser.add_argument("--trabalhadores", type=int, default=4)
+    return parser
+
+
+def executar_ingestao(origem, args):
+    """
+    Ingere uma pasta com as opções da linha de comando e imprime o resumo.
+
+    Args:
+        origem: Pasta com as imagens
+        args: Argumentos lidos por um parser de `criar_parser`
+
+    Returns:
+        Resumo da ingestão (ver `ingerir_pasta`)
+    """
+    resumo = ingerir_pasta(
+        origem,
+        args.destino,
+        tamanho_fragmento=args.tamanho_fragmento,
+        trabalhadores=args.trabalhadores,
+    )
+    print(
+        f"{resumo['novas']} novas, {resumo['ja_ingeridas']} já ingeridas, "
+        f"{resumo['duplicadas']} duplicadas, {resumo['invalidas']} inválidas; "
+        f"{resumo['fragmentos']} fragmentos gravados em {args.destino}"
+    )
+    return resumo
+
+
+def main():
+    parser = criar_parser("Ingere uma pasta local de captchas em fragmentos .npz.")
+    parser.add_argument("origem", help="Pasta com as imagens")
+    args = parser.parse_args()
+
+    executar_ingestao(args.origem, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import csv
+import os
+
+import cv2
+import numpy as np
+
+# Colunas das métricas gravadas por imagem
+COLUNAS_METRICAS = [
+    "arquivo",
+    "texto_esperado",
+    "caracteres_esperados",
+    "componentes",
+    "erro_componentes",
+    "espessura_media",
+    "espessura_desvio",
+    "linha_residual",
+    "fracao_texto",
+]
+
+
+def texto_esperado(nome_arquivo):
+    """
+    Texto esperado de um captcha a partir do nome do arquivo (ex.: "bw44w.png").
+    """
+    return os.path.splitext(os.path.basename(nome_arquivo))[0]
+
+
+def mascara_texto(imagem, texto_escuro=True):
+    """
+    Converte uma imagem processada em uma máscara booleana do texto.
+
+    Args:
+        imagem: Imagem binária (tons de cinza ou BGR) com pixels 0/255
+        texto_escuro: Se True, o texto é preto (0) sobre fundo branco
+
+    Returns:
+        Array booleano (altura, largura), True nos pixels de texto
+    """
+    if imagem.ndim == 3:
+        imagem = imagem[:, :, 0]
+    return imagem == 0 if texto_escuro else imagem > 0
+
+
+def _metricas_mesmo_tamanho(mascaras, area_minima, espessura_linha):
+    """
+    Calcula as métricas de um lote de máscaras com o mesmo tamanho.
+
+    As máscaras são colocadas lado a lado em um mosaico, cada uma precedida
+    por uma coluna de fundo, de forma que a rotulação dos componentes e a
+    transformada de distância são feitas com uma única chamada ao OpenCV para
+    o lote inteiro.
+    """
+    quantidade, altura, largura = mascaras.shape
+    passo = largura + 1
+
+    # Mosaico com uma coluna de fundo antes de cada imagem e uma no final, para
+    # que todas as imagens tenham as mesmas bordas
+    mosaico = np.zeros((altura, quantidade, passo), dtype=np.uint8)
+    mosaico[:, :, 1:] = mascaras.transpose(1, 0, 2)
+    mosaico = np.pad(mosaico.reshape(altura, quantidade * passo), ((0, 0), (0, 1)))
+
+    # Componentes conexos com área mínima, atribuídos à imagem de origem
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mosaico, connectivity=8)
+    stats = stats[1:]
+    validos = stats[:, cv2.CC_STAT_AREA] >= area_minima
+    origem = stats[validos, cv2.CC_STAT_LEFT] // passo
+    componentes = np.bincount(origem, minlength=quantidade)
+
+    # Espessura do traço: 2x a distância ao fundo nas cristas da transformada
+    distancias = cv2.distanceTransform(mosaico, cv2.DIST_L2, 3)
+    cristas = (distancias > 0) & (distancias >= cv2.dilate(distancias, None))
+    distancias = distancias[:, :-1].reshape(altura, quantidade, passo)
+    cristas = cristas[:, :-1].reshape(altura, quantidade, passo)
+    distancias = distancias.transpose(1, 0, 2)
+    cristas = cristas.transpose(1, 0, 2)
+    contagem = cristas.sum(axis=(1, 2))
+    soma = np.where(cristas, distancias, 0).sum(axis=(1, 2), dtype=np.float64)
+    soma2 = np.where(cristas, distancias**2, 0).sum(axis=(1, 2), dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = soma / contagem
+        desvio = np.sqrt(np.maximum(soma2 / contagem - media**2, 0))
+
+    # Linha residual: maior sequência de colunas com traço fino (1 a
+    # `espessura_linha` pixels), típica da linha que atravessa o captcha
+    colunas = mascaras.sum(axis=1)
+    finas = (colunas > 0) & (colunas <= espessura_linha)
+    indices = np.arange(largura)
+    inicio = np.maximum.accumulate(np.where(finas, -1, indices), axis=1)
+    sequencias = np.where(finas, indices - inicio, 0)
+    maior_sequencia = sequencias.max(axis=1)
+
+    return {
+        "componentes": componentes,
+        "espessura_media": np.nan_to_num(2 * media),
+        "espessura_desvio": np.nan_to_num(2 * desvio),
+        "linha_residual": maior_sequencia / largura,
+        "fracao_texto": mascaras.mean(axis=(1, 2)),
+    }
+
+
+def calcular_metricas_lote(
+    imagens, nomes, texto_escuro=True, area_minima=10, espessura_linha=2
+):
+    """
+    Calcula métricas de qualidade sem imagem alvo para um lote de imagens.
+
+    As métricas usam apenas a imagem processada e o texto esperado (nome do
+    arquivo): número de componentes conexos comparado ao número de
+    caracteres, espessura do traço (transformada de distância) e presença de
+    linha residual. Imagens do mesmo tamanho são processadas juntas.
+
+    Args:
+        imagens: Lista de imagens processadas (pixels 0/255)
+        nomes: Lista com o nome do arquivo de cada imagem
+        texto_escuro: Se True, o texto é preto (0) sobre fundo branco
+        area_minima: Área mínima (em pixels) para um componente ser contado
+        espessura_linha: Espessura máxima (em pixels) de uma coluna de linha residual
+
+    Returns:
+        Lista de dicionários (um por imagem) com as colunas de COLUNAS_METRICAS
+    """
+    mascaras = [mascara_texto(imagem, texto_escuro) for imagem in imagens]
+
+    # Agrupar as imagens por tamanho
+    grupos = {}
+    for i, mascara in enumerate(mascaras):
+        grupos.setdefault(mascara.shape, []).append(i)
+
+    metricas = [None] * len(mascaras)
+    for indices in grupos.values():
+        lote = np.stack([mascaras[i] for i in indices]).astype(np.uint8)
+        valores = _metricas_mesmo_tamanho(lote, area_minima, espessura_linha)
+        for j, i in enumerate(indices):
+            texto = texto_esperado(nomes[i])
+            componentes = int(valores["componentes"][j])
+            metricas[i] = {
+                "arquivo": nomes[i],
+                "texto_esperado": texto,
+                "caracteres_esperados": len(texto),
+                "componentes": componentes,
+                "erro_componentes": componentes - len(texto),
+                "espessura_media": round(float(valores["espessura_media"][j]), 3),
+                "espessura_desvio": round(float(valores["espessura_desvio"][j]), 3),
+                "linha_residual": round(float(valores["linha_residual"][j]), 4),
+                "fracao_texto": round(float(valores["fracao_texto"][j]), 4),
+            }
+    return metricas
+
+
+class ResumoMetricas:
+    """
+    Resumo incremental das métricas de um conjunto de imagens.
+
+    Acumula apenas contadores e somas, então o resumo de um lote de qualquer
+    tamanho ocupa memória constante.
+    """
+
+    def __init__(self, limite_linha=0.1):
+        """
+        Args:
+            limite_linha: Valor de `linha_residual` a partir do qual a imagem é
+                considerada com linha residual
+        """
+        self.limite_linha = limite_linha
+        self.imagens = 0
+        self.componentes_corretos = 0
+        self.erro_componentes = 0
+        self.espessura = 0.0
+        self.com_linha_residual = 0
+
+    def adicionar(self, metricas):
+        """
+        Acumula as métricas de um lote de imagens.
+
+        Args:
+            metricas: Lista retornada por `calcular_metricas_lote`
+
+        Returns:
+            O próprio resumo (para encadear chamadas)
+        """
+        for m in metricas:
+            self.imagens += 1
+            self.componentes_corretos += m["erro_componentes"] == 0
+            self.erro_componentes += abs(m["erro_componentes"])
+            self.espessura += m["espessura_media"]
+            self.com_linha_residual += m["linha_residual"] >= self.limite_linha
+        return self
+
+    def resumo(self):
+        """
+        Retorna o resumo no formato de `resumir_metricas` ({} se vazio).
+        """
+        if not self.imagens:
+            return {}
+        return {
+            "imagens": self.imagens,
+            "componentes_corretos": self.componentes_corretos / self.imagens,
+            "erro_componentes_medio": self.erro_componentes / self.imagens,
+            "espessura_media": self.espessura / self.imagens,
+            "com_linha_residual": self.com_linha_residual / self.imagens,
+        }
+
+
+def resumir_metricas(metricas, limite_linha=0.1):
+    """
+    Resume as métricas de um conjunto de imagens.
+
+    Args:
+        metricas: Lista retornada por `calcular_metricas_lote`
+        limite_linha: Valor de `linha_residual` a partir do qual a imagem é
+            considerada com linha residual
+
+    Returns:
+        Dicionário com o total de imagens, a fração com o número de
+        componentes igual ao de caracteres, o erro absoluto médio de
+        componentes, a espessura média e a fração com linha residual
+    """
+    return ResumoMetricas(limite_linha).adicionar(metricas).resumo()
+
+
+class RegistroMetricas:
+    """
+    Grava as métricas por imagem em um CSV à medida que são calculadas.
+
+    O resumo é acumulado em um ResumoMetricas e apenas as primeiras
+    `limite_amostras` linhas ficam em memória (para exibição), então a
+    memória não cresce com o número de imagens.
+    """
+
+    def __init__(self, caminho, limite_linha=0.1, limite_amostras=100):
+        """
+        Args:
+            caminho: Caminho do arquivo CSV
+            limite_linha: Valor de `linha_residual` a partir do qual a imagem é
+                considerada com linha residual
+            limite_amostras: Número de linhas mantidas em `amostras`
+        """
+        self.caminho = caminho
+        self.limite_amostras = limite_amostras
+        self.amostras = []
+        self._resumo = ResumoMetricas(limite_linha)
+        self._arquivo = open(caminho, "w", newline="")
+        self._escritor = csv.DictWriter(self._arquivo, fieldnames=COLUNAS_METRICAS)
+        self._escritor.writeheader()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def adicionar(self, metricas):
+        """
+        Grava as métricas de um lote e as acumula no resumo.
+
+        Args:
+            metricas: Lista retornada por `calcular_metricas_lote`
+        """
+        self._escritor.writerows(metricas)
+        self._resumo.adicionar(metricas)
+        faltando = self.limite_amostras - len(self.amostras)
+        if faltando > 0:
+            self.amostras.extend(metricas[:faltando])
+
+    @property
+    def imagens(self):
+        return self._resumo.imagens
+
+    def resumo(self):
+        """
+        Retorna o resumo das métricas gravadas (ver `resumir_metricas`).
+        """
+        return self._resumo.resumo()
+
+    def fechar(self):
+        """
+        Fecha o arquivo CSV.
+        """
+        self._arquivo.close()
+
+
+def salvar_metricas_csv(metricas, caminho):
+    """
+    Grava as métricas por imagem em um arquivo CSV.
+
+    Args:
+        metricas: Lista retornada por `calcular_metricas_lote`
+        caminho: Caminho do arquivo CSV
+
+    Returns:
+        Caminho do arquivo gravado
+    """
+    with open(caminho, "w", newline="") as f:
+        escritor = csv.DictWriter(f, fieldnames=COLUNAS_METRICAS)
+        escritor.writeheader()
+        escritor.writerows(metricas)
+    return caminho
@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class ModeloSubstituto:
+    """
+    Modelo substituto de vizinhos mais próximos para estimar a aptidão.
+
+    Aprende com os genomas já avaliados no pipeline real. A previsão é a média
+    das aptidões dos `k` vizinhos mais próximos, ponderada pelo inverso da
+    distância, no espaço dos genes normalizados para o intervalo [0, 1].
+    """
+
+    def __init__(self, limites, k=5, minimo_amostras=20):
+        """
+        Args:
+            limites: Dicionário parâmetro -> (mínimo, máximo)
+            k: Número de vizinhos usados na previsão
+            minimo_amostras: Número de avaliações reais antes de o modelo ser usado
+        """
+        self.parametros = list(limites)
+        self.k = k
+        self.minimo_amostras = minimo_amostras
+        self._minimos = np.array([limites[p][0] for p in self.parametros], float)
+        self._amplitudes = np.array(
+            [max(1, limites[p][1] - limites[p][0]) for p in self.parametros], float
+        )
+        self._genomas = []
+        self._aptidoes = []
+
+    def __len__(self):
+        return len(self._aptidoes)
+
+    @property
+    def pronto(self):
+        """
+        Indica se o modelo já tem amostras suficientes para fazer previsões.
+        """
+        return len(self) >= self.minimo_amostras
+
+    def _normalizar(self, individuos):
+        genomas = np.array(
+            [[individuo[p] for p in self.parametros] for individuo in individuos],
+            dtype=float,
+        )
+        return (genomas - self._minimos) / self._amplitudes
+
+    def adicionar(self, individuo, aptidao):
+        """
+        Adiciona um genoma avaliado no pipeline real ao conjunto de treino.
+        """
+        self._genomas.append(self._normalizar([individuo])[0])
+        self._aptidoes.append(float(aptidao))
+
+    def prever(self, individuos):
+        """
+        Estima a aptidão de uma lista de indivíduos.
+
+        Args:
+            individuos: Lista de indivíduos (dicionários de parâmetros)
+
+        Returns:
+            Array com a aptidão estimada de cada indivíduo
+        """
+        consultas = self._normalizar(individuos)
+        genomas = np.array(self._genomas)
+        aptidoes = np.array(self._aptidoes)
+
+        # Distâncias de todas as consultas a todos os genomas conhecidos
+        distancias = np.sqrt(
+            ((consultas[:, None, :] - genomas[None, :, :]) ** 2).sum(axis=2)
+        )
+        k = min(self.k, len(aptidoes))
+        vizinhos = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+        distancias_vizinhos = np.take_along_axis(distancias, vizinhos, axis=1)
+
+        # Ponderação pelo inverso da distância (genoma idêntico domina)
+        pesos = 1.0 / (distancias_vizinhos + 1e-9)
+        return (pesos * aptidoes[vizinhos]).sum(axis=1) / pesos.sum(axis=1)
@@ -1,6 +1,27 @@
-import kagglehub
+from ingestao_dataset import criar_parser, executar_ingestao
 
-# Download da última versão
-path = kagglehub.dataset_download("fournierp/captcha-version-2-images")
 
-print("Path to dataset files:", path)
+def main():
+    parser = criar_parser(
+        "Baixa o dataset de captchas do Kaggle e o ingere em fragmentos."
+    )
+    parser.add_argument(
+        "--origem",
+        help="Pasta local já baixada (não faz o download quando informada)",
+    )
+    args = parser.parse_args()
+
+    path = args.origem
+    if path is None:
+        import kagglehub
+
+        # Download da última versão
+        path = kagglehub.dataset_download("fournierp/captcha-version-2-images")
+
+        print("Path to dataset files:", path)
+
+    executar_ingestao(path, args)
+
+
+if __name__ == "__main__":
+    main()
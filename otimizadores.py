@@ -0,0 +1,360 @@
+import math
+import random
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from algoritmo_genetico import (
+    LIMITES_PARAMETROS,
+    EventoGeracao,
+    avaliar_populacao,
+    consumir_eventos,
+    criar_populacao,
+    iterar_algoritmo_genetico,
+    limitar_individuo,
+    medir_diversidade,
+)
+
+
+class Otimizador(ABC):
+    """
+    Interface comum dos otimizadores de parâmetros.
+
+    Todo otimizador é configurado no construtor e pode ser percorrido com
+    `iterar`, que emite um EventoGeracao por geração, ou executado com
+    `executar`, que chama o callback a cada geração com os mesmos argumentos
+    usados por `executar_algoritmo_genetico` e devolve a mesma tupla
+    (melhor, aptidao, historico_aptidoes, historico_parametros).
+
+    Subclasses implementam `iterar`; otimizadores baseados em modelo herdam
+    de `OtimizadorModelo`.
+    """
+
+    def __init__(
+        self,
+        tamanho_populacao=20,
+        geracoes=50,
+        semente=None,
+        trabalhadores=1,
+        usar_roi=True,
+    ):
+        """
+        Args:
+            tamanho_populacao: Número de indivíduos avaliados por geração
+            geracoes: Número de gerações
+            semente: Semente dos geradores de números aleatórios da execução
+            trabalhadores: Número de threads de avaliação (não altera o resultado)
+            usar_roi: Se True, avalia apenas a região de interesse das imagens
+                (não altera o resultado)
+        """
+        self.tamanho_populacao = tamanho_populacao
+        self.geracoes = geracoes
+        self.semente = semente
+        self.trabalhadores = trabalhadores
+        self.usar_roi = usar_roi
+
+    @abstractmethod
+    def iterar(self, imagem_path, imagem_alvo_path, estatisticas=None):
+        """
+        Executa o otimizador como um gerador, emitindo um evento por geração.
+
+        Args:
+            imagem_path: Caminho para a imagem a ser processada
+            imagem_alvo_path: Caminho para a imagem alvo
+            estatisticas: Dicionário (opcional) preenchido com os contadores de avaliações
+
+        Yields:
+            EventoGeracao de cada geração
+        """
+
+    def executar(
+        self,
+        imagem_path,
+        imagem_alvo_path,
+        callback=None,
+        estatisticas=None,
+        limite_historico=None,
+    ):
+        """
+        Executa o otimizador para encontrar os melhores parâmetros de processamento.
+
+        Args:
+            imagem_path: Caminho para a imagem a ser processada
+            imagem_alvo_path: Caminho para a imagem alvo
+            callback: Função de callback para atualizar a interface (opcional)
+            estatisticas: Dicionário (opcional) preenchido com os contadores de avaliações
+            limite_historico: Número máximo de gerações mantidas nos históricos
+                (buffers circulares); None mantém o histórico completo
+
+        Returns:
+            Tupla com o melhor indivíduo, seu valor de aptidão, o histórico de
+            aptidões e o histórico de parâmetros
+        """
+        return consumir_eventos(
+            self.iterar(imagem_path, imagem_alvo_path, estatisticas),
+            callback,
+            limite_historico,
+        )
+
+
+class OtimizadorModelo(Otimizador):
+    """
+    Base dos otimizadores baseados em modelo.
+
+    Subclasses implementam `propor` e `observar`; o laço de avaliação e os
+    eventos ficam nesta classe.
+    """
+
+    @abstractmethod
+    def propor(self, geracao):
+        """
+        Propõe os indivíduos a serem avaliados nesta geração.
+        """
+
+    @abstractmethod
+    def observar(self, individuos, aptidoes):
+        """
+        Recebe as aptidões reais dos indivíduos propostos.
+        """
+
+    def iterar(self, imagem_path, imagem_alvo_path, estatisticas=None):
+        """
+        A cada geração, avalia os indivíduos de `propor`, repassa as aptidões
+        para `observar` e emite um EventoGeracao (ver `Otimizador.iterar`).
+        """
+        if estatisticas is None:
+            estatisticas = {}
+        arquivo = {}
+        melhor_global = None
+        melhor_aptidao_global = 0
+
+        for geracao in range(self.geracoes):
+            # Avaliar os indivíduos propostos (genomas repetidos não são reavaliados)
+            avaliacoes_anteriores = estatisticas.get("avaliacoes_reais", 0)
+            individuos = self.propor(geracao)
+            aptidoes, _ = avaliar_populacao(
+                individuos,
+                imagem_path,
+                imagem_alvo_path,
+                arquivo,
+                estatisticas=estatisticas,
+                trabalhadores=self.trabalhadores,
+                usar_roi=self.usar_roi,
+            )
+            self.observar(individuos, aptidoes)
+
+            # Melhor indivíduo desta geração e melhor global
+            melhor_indice = aptidoes.index(max(aptidoes))
+            melhor_individuo = individuos[melhor_indice]
+            melhor_aptidao = aptidoes[melhor_indice]
+            melhorou = melhor_aptidao > melhor_aptidao_global
+            if melhorou:
+                melhor_global = melhor_individuo.copy()
+                melhor_aptidao_global = melhor_aptidao
+
+            yield EventoGeracao(
+                geracao,
+                self.geracoes,
+                melhor_individuo,
+                melhor_aptidao,
+                melhor_global,
+                melhor_aptidao_global,
+                melhorou,
+                estatisticas["avaliacoes_reais"] - avaliacoes_anteriores,
+                diversidade=medir_diversidade(individuos),
+            )
+
+
+class OtimizadorGenetico(Otimizador):
+    """
+    Algoritmo genético (`iterar_algoritmo_genetico`) na interface comum.
+    """
+
+    def __init__(
+        self,
+        tamanho_populacao=20,
+        geracoes=50,
+        semente=None,
+        trabalhadores=1,
+        usar_roi=True,
+        **opcoes,
+    ):
+        """
+        Args:
+            tamanho_populacao: Tamanho da população
+            geracoes: Número de gerações
+            semente: Semente do gerador de números aleatórios da execução
+            trabalhadores: Número de threads de avaliação (não altera o resultado)
+            usar_roi: Se True, avalia apenas a região de interesse das imagens
+            **opcoes: Demais argumentos de `iterar_algoritmo_genetico`
+                (taxa_mutacao, operador_mutacao, substituto, ...)
+        """
+        super().__init__(tamanho_populacao, geracoes, semente, trabalhadores, usar_roi)
+        self.opcoes = opcoes
+
+    def iterar(self, imagem_path, imagem_alvo_path, estatisticas=None):
+        return iterar_algoritmo_genetico(
+            imagem_path,
+            imagem_alvo_path,
+            tamanho_populacao=self.tamanho_populacao,
+            geracoes=self.geracoes,
+            estatisticas=estatisticas,
+            semente=self.semente,
+            trabalhadores=self.trabalhadores,
+            usar_roi=self.usar_roi,
+            **self.opcoes,
+        )
+
+
+class OtimizadorTPE(OtimizadorModelo):
+    """
+    Tree-structured Parzen Estimator para parâmetros inteiros.
+
+    A primeira geração é aleatória (ou a `populacao_inicial`, se fornecida,
+    completada com indivíduos aleatórios). Nas seguintes, as observações são divididas
+    entre as melhores (fração `gama`) e as demais; para cada parâmetro são
+    estimadas as densidades l(x) (melhores) e g(x) (demais) com núcleos
+    gaussianos discretos sobre o intervalo do parâmetro. São sorteados
+    `candidatos` indivíduos de l(x) e os que maximizam l(x)/g(x) são avaliados.
+    """
+
+    def __init__(
+        self,
+        tamanho_populacao=20,
+        geracoes=50,
+        gama=0.25,
+        candidatos=256,
+        largura_banda=0.1,
+        peso_prior=1.0,
+        semente=None,
+        trabalhadores=1,
+        populacao_inicial=None,
+        usar_roi=True,
+    ):
+        """
+        Args:
+            tamanho_populacao: Número de indivíduos avaliados por geração
+            geracoes: Número de gerações
+            gama: Fração das observações consideradas "melhores"
+            candidatos: Número de candidatos sorteados por geração
+            largura_banda: Largura dos núcleos relativa à amplitude do parâmetro
+            peso_prior: Peso da distribuição uniforme misturada às densidades
+            semente: Semente dos geradores de números aleatórios da execução
+            trabalhadores: Número de threads de avaliação (não altera o resultado)
+            populacao_inicial: Indivíduos avaliados na primeira geração (warm start)
+            usar_roi: Se True, avalia apenas a região de interesse das imagens
+        """
+        super().__init__(tamanho_populacao, geracoes, semente, trabalhadores, usar_roi)
+        self.populacao_inicial = populacao_inicial or []
+        self.gama = gama
+        self.candidatos = candidatos
+        self.largura_banda = largura_banda
+        self.peso_prior = peso_prior
+        self.parametros = list(LIMITES_PARAMETROS)
+        self._valores = [
+            np.arange(minimo, maximo + 1) for minimo, maximo in LIMITES_PARAMETROS.values()
+        ]
+        self._genomas = []
+        self._aptidoes = []
+        self._avaliados = set()
+        self._rng = None
+        self._rng_numpy = None
+
+    def iterar(self, imagem_path, imagem_alvo_path, estatisticas=None):
+        # Reiniciar as observações e os geradores isolados desta execução
+        self._genomas = []
+        self._aptidoes = []
+        self._avaliados = set()
+        self._rng = random.Random(self.semente)
+        self._rng_numpy = np.random.default_rng(self._rng.getrandbits(64))
+        return super().iterar(imagem_path, imagem_alvo_path, estatisticas)
+
+    def _densidades(self, observacoes, valores, amplitude):
+        """
+        Densidade discreta (núcleos gaussianos + prior uniforme) sobre `valores`.
+        """
+        desvio = max(0.5, self.largura_banda * amplitude)
+        nucleos = np.exp(-0.5 * ((valores[None, :] - observacoes[:, None]) / desvio) ** 2)
+        nucleos /= nucleos.sum(axis=1, keepdims=True)
+        densidade = nucleos.sum(axis=0) + self.peso_prior / len(valores)
+        return densidade / densidade.sum()
+
+    def propor(self, geracao):
+        if geracao == 0:
+            populacao = [limitar_individuo(p) for p in self.populacao_inicial]
+            populacao = populacao[: self.tamanho_populacao]
+            return populacao + criar_populacao(
+                self.tamanho_populacao - len(populacao), self._rng
+            )
+        if len(self._aptidoes) < self.tamanho_populacao:
+            return criar_populacao(self.tamanho_populacao, self._rng)
+
+        genomas = np.array(self._genomas)
+        ordem = np.argsort(self._aptidoes)[::-1]
+        quantidade_melhores = max(1, math.ceil(self.gama * len(ordem)))
+        melhores = genomas[ordem[:quantidade_melhores]]
+        demais = genomas[ordem[quantidade_melhores:]]
+
+        # Sortear candidatos de l(x) e pontuar por log l(x) - log g(x), gene a gene
+        amostras = np.empty((self.candidatos, len(self.parametros)), dtype=int)
+        pontuacao = np.zeros(self.candidatos)
+        for j, valores in enumerate(self._valores):
+            amplitude = valores[-1] - valores[0]
+            l = self._densidades(melhores[:, j], valores, amplitude)
+            g = self._densidades(demais[:, j], valores, amplitude)
+            indices = self._rng_numpy.choice(len(valores), size=self.candidatos, p=l)
+            amostras[:, j] = valores[indices]
+            pontuacao += np.log(l[indices]) - np.log(g[indices])
+
+        # Escolher os melhores candidatos ainda não avaliados
+        propostos = []
+        escolhidos = set()
+        for i in np.argsort(pontuacao)[::-1]:
+            chave = tuple(int(v) for v in amostras[i])
+            if chave in self._avaliados or chave in escolhidos:
+                continue
+            escolhidos.add(chave)
+            propostos.append(dict(zip(self.parametros, chave)))
+            if len(propostos) == self.tamanho_populacao:
+                break
+
+        # Completar com indivíduos aleatórios se faltarem candidatos inéditos
+        while len(propostos) < self.tamanho_populacao:
+            propostos.extend(
+                criar_populacao(self.tamanho_populacao - len(propostos), self._rng)
+            )
+        return propostos
+
+    def observar(self, individuos, aptidoes):
+        for individuo, aptidao in zip(individuos, aptidoes):
+            chave = tuple(individuo[p] for p in self.parametros)
+            if chave in self._avaliados:
+                continue
+            self._avaliados.add(chave)
+            self._genomas.append(chave)
+            self._aptidoes.append(float(aptidao))
+
+
+# Otimizadores disponíveis por nome
+OTIMIZADORES = {
+    "genetico": OtimizadorGenetico,
+    "tpe": OtimizadorTPE,
+}
+
+
+def criar_otimizador(nome="genetico", **opcoes):
+    """
+    Cria um otimizador a partir do nome.
+
+    Args:
+        nome: Nome do otimizador ("genetico" ou "tpe")
+        **opcoes: Argumentos do construtor do otimizador
+
+    Returns:
+        Instância de Otimizador
+    """
+    if nome not in OTIMIZADORES:
+        raise ValueError(
+            f"Otimizador desconhecido: {nome}. Use um de: {', '.join(OTIMIZADORES)}"
+        )
+    return OTIMIZADORES[nome](**opcoes)
@@ -1,25 +1,192 @@
 import cv2
 import numpy as np
 import os
+import struct
+from imagem_binaria import AlvoPreparado, CacheLRU, ImagemBinaria
 
+# Cabeçalho do formato binário empacotado: assinatura, altura, largura,
+# canais armazenados e canais originais
+CABECALHO_BINARIO = struct.Struct("<4sHHBB")
+ASSINATURA_BINARIA = b"CBIN"
 
-def calcular_similaridade(img1, img2):
+# Caches em memória usados na avaliação repetida das mesmas imagens
+cache_imagens = CacheLRU(limite_bytes=64 * 1024 * 1024)
+cache_limiarizadas = CacheLRU(limite_bytes=32 * 1024 * 1024)
+cache_alvos = CacheLRU(limite_bytes=64 * 1024 * 1024)
+cache_rois = CacheLRU(limite_bytes=1024 * 1024)
+
+
+def processar_imagem_array(params, imagem):
     """
-    Calcula a similaridade entre duas imagens usando o método de correlação normalizada.
-    
+    Aplica o pipeline de processamento a uma imagem já carregada em memória.
+
     Args:
-        img1: Primeira imagem para comparação
-        img2: Segunda imagem para comparação
-        
+        params: Dicionário com os parâmetros de processamento
+        imagem: Imagem BGR (array NumPy) a ser processada
+
     Returns:
-        Valor de similaridade entre -1 e 1, onde 1 indica imagens idênticas
+        Imagem processada
     """
-    # Garantir que as imagens têm o mesmo tamanho
-    if img1.shape != img2.shape:
-        img2 = cv2.resize(img2, (img1.shape[1], img1.shape[0]))
+    # Extrair parâmetros
+    threshold_value = params["threshold"]
+    blur_size = params["blur"]
+    dilate_kernel_size = params["dilate_size"]
+    dilate_kernel_shape = params["dilate_shape"]
+    erode_kernel_size = params["erode_size"]
+    erode_kernel_shape = params["erode_shape"]
+
+    # Aplicar blur
+    image = cv2.blur(imagem, (blur_size, blur_size))
+
+    # Aplicar threshold
+    ret, image = cv2.threshold(image, threshold_value, 255, cv2.THRESH_BINARY)
+
+    # Aplicar dilate
+    dilate_kernel = np.ones((dilate_kernel_size, dilate_kernel_shape), np.uint8)
+    image = cv2.dilate(image, dilate_kernel)
 
-    # Calcular a similaridade usando o método de correlação normalizada
-    return cv2.matchTemplate(img1, img2, cv2.TM_CCOEFF_NORMED)[0][0]
+    # Aplicar erode
+    erode_kernel = np.ones((erode_kernel_size, erode_kernel_shape), np.uint8)
+    image = cv2.erode(image, erode_kernel)
+
+    return image
+
+
+def codificar_binaria(imagem):
+    """
+    Codifica uma imagem binária (pixels 0/255) com 8 pixels por byte.
+
+    Se todos os canais forem iguais, apenas um canal é armazenado.
+
+    Args:
+        imagem: Imagem binária (tons de cinza ou BGR) ou ImagemBinaria
+
+    Returns:
+        Bytes no formato binário empacotado
+    """
+    if not isinstance(imagem, ImagemBinaria):
+        imagem = ImagemBinaria.de_imagem(imagem)
+
+    cabecalho = CABECALHO_BINARIO.pack(
+        ASSINATURA_BINARIA,
+        imagem.altura,
+        imagem.largura,
+        imagem.canais,
+        imagem.canais_originais,
+    )
+    return cabecalho + imagem.bits.tobytes()
+
+
+def decodificar_binaria(dados, empacotada=False):
+    """
+    Decodifica bytes gerados por `codificar_binaria`.
+
+    Args:
+        dados: Bytes no formato binário empacotado
+        empacotada: Se True, devolve a ImagemBinaria sem desempacotar os pixels
+
+    Returns:
+        Imagem com pixels 0/255 no formato original (ou ImagemBinaria)
+        ou None se os dados forem inválidos
+    """
+    if len(dados) < CABECALHO_BINARIO.size:
+        return None
+    assinatura, altura, largura, canais, canais_originais = (
+        CABECALHO_BINARIO.unpack_from(dados)
+    )
+    if assinatura != ASSINATURA_BINARIA:
+        return None
+
+    bytes_por_canal = (altura * largura + 7) // 8
+    if canais == 0 or len(dados) < CABECALHO_BINARIO.size + canais * bytes_por_canal:
+        # Dados truncados
+        return None
+    bits = np.frombuffer(
+        dados,
+        dtype=np.uint8,
+        count=canais * bytes_por_canal,
+        offset=CABECALHO_BINARIO.size,
+    ).reshape(canais, bytes_por_canal)
+    imagem = ImagemBinaria(bits, altura, largura, canais_originais)
+    return imagem if empacotada else imagem.para_imagem()
+
+
+def decodificar_imagem(dados):
+    """
+    Decodifica uma imagem a partir de bytes em memória.
+
+    Args:
+        dados: Bytes (ou buffer) com o conteúdo de um arquivo de imagem
+
+    Returns:
+        Imagem BGR decodificada ou None se os dados forem inválidos
+    """
+    buffer = np.frombuffer(dados, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    if buffer[:4].tobytes() == ASSINATURA_BINARIA:
+        return decodificar_binaria(buffer.tobytes())
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def codificar_imagem(imagem, formato=".png", compressao_png=3):
+    """
+    Codifica uma imagem em memória.
+
+    Formatos suportados: ".png" (com nível de compressão), ".webp" (sem perdas),
+    ".bin" (binário empacotado, apenas para imagens 0/255) e demais extensões
+    aceitas pelo OpenCV.
+
+    Args:
+        imagem: Imagem a ser codificada
+        formato: Extensão do formato de saída (padrão: ".png")
+        compressao_png: Nível de compressão PNG entre 0 (mais rápido) e 9 (menor arquivo)
+
+    Returns:
+        Bytes da imagem codificada ou None se ocorrer um erro
+    """
+    formato = formato.lower()
+    if formato == ".bin":
+        return codificar_binaria(imagem)
+
+    parametros = []
+    if formato == ".png":
+        parametros = [cv2.IMWRITE_PNG_COMPRESSION, int(compressao_png)]
+    elif formato == ".webp":
+        # Qualidade acima de 100 ativa o modo sem perdas do WebP
+        parametros = [cv2.IMWRITE_WEBP_QUALITY, 101]
+
+    ok, codificada = cv2.imencode(formato, imagem, parametros)
+    if not ok:
+        return None
+    return codificada.tobytes()
+
+
+def processar_imagem_bytes(params, dados, compressao_png=3):
+    """
+    Processa uma imagem recebida como bytes e devolve o PNG processado em bytes.
+
+    Args:
+        params: Dicionário com os parâmetros de processamento
+        dados: Bytes do arquivo de imagem original
+        compressao_png: Nível de compressão PNG da saída (0–9)
+
+    Returns:
+        Bytes do PNG processado ou None se ocorrer um erro
+    """
+    try:
+        image = decodificar_imagem(dados)
+        if image is None:
+            print("Erro ao decodificar a imagem recebida")
+            return None
+
+        return codificar_imagem(
+            processar_imagem_array(params, image), compressao_png=compressao_png
+        )
+
+    except Exception as e:
+        print(f"Erro ao processar a imagem recebida: {str(e)}")
+        return None
 
 
 def processar_imagem(params, imagem_path):
@@ -34,43 +201,244 @@ def processar_imagem(params, imagem_path):
         Imagem processada ou None se ocorrer um erro
     """
     try:
-        # Extrair parâmetros
-        threshold_value = params["threshold"]
-        blur_size = params["blur"]
-        dilate_kernel_size = params["dilate_size"]
-        dilate_kernel_shape = params["dilate_shape"]
-        erode_kernel_size = params["erode_size"]
-        erode_kernel_shape = params["erode_shape"]
-
         # Carregar a imagem
-        image = cv2.imread(imagem_path)
+        image = None
+        if os.path.isfile(imagem_path):
+            image = decodificar_imagem(np.fromfile(imagem_path, dtype=np.uint8))
 
         # Verificar se a imagem foi carregada corretamente
         if image is None:
             print(f"Erro ao carregar a imagem: {imagem_path}")
             return None
 
-        # Aplicar blur
-        image = cv2.blur(image, (blur_size, blur_size))
+        return processar_imagem_array(params, image)
+    
+    except Exception as e:
+        print(f"Erro ao processar a imagem {imagem_path}: {str(e)}")
+        return None
+
+
+def _chave_arquivo(caminho):
+    """
+    Chave de cache de um arquivo: caminho, data de modificação e tamanho.
+    """
+    info = os.stat(caminho)
+    return (os.path.abspath(caminho), info.st_mtime_ns, info.st_size)
+
+
+def carregar_imagem(caminho):
+    """
+    Carrega uma imagem usando o cache de imagens decodificadas.
+
+    A imagem devolvida é somente leitura, pois é compartilhada pelo cache.
+
+    Args:
+        caminho: Caminho para a imagem
+
+    Returns:
+        Imagem BGR ou None se não for possível carregá-la
+    """
+    if not os.path.isfile(caminho):
+        return None
+    chave = _chave_arquivo(caminho)
+    imagem = cache_imagens.obter(chave)
+    if imagem is None:
+        imagem = decodificar_imagem(np.fromfile(caminho, dtype=np.uint8))
+        if imagem is None:
+            return None
+        imagem.flags.writeable = False
+        cache_imagens.guardar(chave, imagem, imagem.nbytes)
+    return imagem
+
 
-        # Aplicar threshold
-        ret, image = cv2.threshold(image, threshold_value, 255, cv2.THRESH_BINARY)
+def carregar_alvo(caminho, formato=None, roi=None):
+    """
+    Carrega e prepara uma imagem alvo para o cálculo da similaridade.
+
+    O alvo preparado (e redimensionado, se necessário) fica em cache, então o
+    arquivo é lido e o redimensionamento é feito uma única vez.
+
+    Args:
+        caminho: Caminho para a imagem alvo
+        formato: Tupla (altura, largura) da imagem processada inteira (opcional)
+        roi: Região de interesse (y0, y1, x0, x1) da imagem processada (opcional)
+
+    Returns:
+        AlvoPreparado ou None se não for possível carregar a imagem
+    """
+    if not os.path.isfile(caminho):
+        return None
+    chave = (_chave_arquivo(caminho), formato, roi)
+    alvo = cache_alvos.obter(chave)
+    if alvo is None:
+        imagem_alvo = carregar_imagem(caminho)
+        if imagem_alvo is None:
+            return None
+        # Garantir que o alvo tenha o mesmo tamanho da imagem processada
+        if formato is not None and imagem_alvo.shape[:2] != tuple(formato):
+            imagem_alvo = cv2.resize(imagem_alvo, (formato[1], formato[0]))
+        alvo = AlvoPreparado(imagem_alvo, roi)
+        cache_alvos.guardar(chave, alvo, alvo.nbytes)
+    return alvo
+
+
+def assinatura_imagem(caminho, tamanho=(64, 16)):
+    """
+    Calcula uma assinatura compacta da imagem para comparar captchas parecidos.
+
+    A imagem é convertida para tons de cinza, reduzida e normalizada (média 0,
+    desvio padrão 1), de forma que a distância entre assinaturas independa do
+    tamanho original e do brilho.
+
+    Args:
+        caminho: Caminho para a imagem
+        tamanho: Tamanho (largura, altura) da assinatura
+
+    Returns:
+        Array float32 com a assinatura ou None se não for possível carregar a imagem
+    """
+    imagem = carregar_imagem(caminho)
+    if imagem is None:
+        return None
+    cinza = cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY)
+    reduzida = cv2.resize(cinza, tamanho, interpolation=cv2.INTER_AREA)
+    reduzida = reduzida.astype(np.float32)
+    return (reduzida - reduzida.mean()) / (reduzida.std() + 1e-6)
+
+
+def calcular_roi(imagem_path, limiar_maximo=150, margem=10):
+    """
+    Calcula a região de interesse (ROI) de uma imagem: o retângulo que contém
+    todos os pixels que podem ficar escuros no processamento, com uma margem.
+
+    Um pixel só fica escuro após o threshold se algum pixel a até o raio do
+    blur tiver valor menor ou igual ao threshold, e a erosão só espalha o
+    escuro pelo tamanho do kernel. Com `limiar_maximo` igual ao maior
+    threshold possível e `margem` maior que o raio do blur somado ao tamanho
+    do kernel de erosão, a imagem processada é branca (255) fora da ROI para
+    quaisquer parâmetros. O resultado fica em cache.
+
+    Args:
+        imagem_path: Caminho para a imagem
+        limiar_maximo: Maior valor de threshold usado no processamento
+        margem: Margem em pixels ao redor dos pixels escuros
+
+    Returns:
+        Tupla (y0, y1, x0, x1) ou None se não for possível carregar a imagem.
+        Imagens sem pixels escuros resultam em uma ROI de um pixel.
+    """
+    if not os.path.isfile(imagem_path):
+        return None
+    chave = (_chave_arquivo(imagem_path), limiar_maximo, margem)
+    roi = cache_rois.obter(chave)
+    if roi is None:
+        imagem = carregar_imagem(imagem_path)
+        if imagem is None:
+            return None
+        escuros = imagem <= limiar_maximo
+        if escuros.ndim == 3:
+            escuros = escuros.any(axis=2)
+        linhas = np.flatnonzero(escuros.any(axis=1))
+        colunas = np.flatnonzero(escuros.any(axis=0))
+        if len(linhas) == 0:
+            roi = (0, 1, 0, 1)
+        else:
+            altura, largura = escuros.shape
+            roi = (
+                max(0, int(linhas[0]) - margem),
+                min(altura, int(linhas[-1]) + 1 + margem),
+                max(0, int(colunas[0]) - margem),
+                min(largura, int(colunas[-1]) + 1 + margem),
+            )
+        cache_rois.guardar(chave, roi, 64)
+    return roi
+
+
+def processar_imagem_binaria(params, imagem_path, roi=None):
+    """
+    Processa uma imagem e devolve o resultado como ImagemBinaria.
+
+    O resultado de blur + threshold é guardado empacotado em cache, de forma
+    que indivíduos que compartilham esses genes só executam a dilatação e a
+    erosão. Quando os canais são idênticos, a morfologia roda em um único canal.
+
+    Args:
+        params: Dicionário com os parâmetros de processamento
+        imagem_path: Caminho para a imagem a ser processada
+        roi: Região de interesse (y0, y1, x0, x1); se informada, apenas o
+            recorte é processado (ver `calcular_roi`)
+
+    Returns:
+        ImagemBinaria processada ou None se ocorrer um erro
+    """
+    try:
+        chave = (
+            _chave_arquivo(imagem_path),
+            params["blur"],
+            params["threshold"],
+            roi,
+        )
+        limiarizada = cache_limiarizadas.obter(chave)
+        if limiarizada is None:
+            image = carregar_imagem(imagem_path)
+            if image is None:
+                print(f"Erro ao carregar a imagem: {imagem_path}")
+                return None
+            if roi is not None:
+                y0, y1, x0, x1 = roi
+                image = image[y0:y1, x0:x1]
+
+            # Aplicar blur e threshold
+            image = cv2.blur(image, (params["blur"], params["blur"]))
+            ret, image = cv2.threshold(
+                image, params["threshold"], 255, cv2.THRESH_BINARY
+            )
+            limiarizada = ImagemBinaria.de_imagem(image)
+            cache_limiarizadas.guardar(chave, limiarizada, limiarizada.nbytes)
+
+        image = limiarizada.para_imagem(colapsar=True)
 
         # Aplicar dilate
-        dilate_kernel = np.ones((dilate_kernel_size, dilate_kernel_shape), np.uint8)
+        dilate_kernel = np.ones((params["dilate_size"], params["dilate_shape"]), np.uint8)
         image = cv2.dilate(image, dilate_kernel)
 
         # Aplicar erode
-        erode_kernel = np.ones((erode_kernel_size, erode_kernel_shape), np.uint8)
+        erode_kernel = np.ones((params["erode_size"], params["erode_shape"]), np.uint8)
         image = cv2.erode(image, erode_kernel)
 
-        return image
-    
+        # Empacotar mantendo o número de canais da imagem original
+        resultado = ImagemBinaria.de_imagem(image)
+        resultado.canais_originais = limiarizada.canais_originais
+        return resultado
+
     except Exception as e:
         print(f"Erro ao processar a imagem {imagem_path}: {str(e)}")
         return None
 
 
+def salvar_imagem(caminho, imagem, compressao_png=3):
+    """
+    Salva uma imagem em disco com o nível de compressão PNG escolhido.
+
+    Args:
+        caminho: Caminho do arquivo de saída (a extensão define o formato)
+        imagem: Imagem a ser salva
+        compressao_png: Nível de compressão PNG (0–9)
+
+    Returns:
+        True se a imagem foi salva com sucesso, False caso contrário
+    """
+    formato = os.path.splitext(caminho)[1] or ".png"
+    dados = codificar_imagem(imagem, formato=formato, compressao_png=compressao_png)
+    if dados is None:
+        print(f"Erro ao codificar a imagem: {caminho}")
+        return False
+
+    with open(caminho, "wb") as f:
+        f.write(dados)
+    return True
+
+
 def garantir_pasta_resultados(pasta="resultados"):
     """
     Garante que a pasta de resultados exista.
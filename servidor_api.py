@@ -0,0 +1,536 @@
+import argparse
+import json
+import numbers
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from algoritmo_genetico import ler_arquivo_parametros
+from processamento_imagem import (
+    codificar_imagem,
+    decodificar_imagem,
+    processar_imagem_array,
+)
+
+
+# Parâmetros usados quando nenhum conjunto é informado na requisição
+PARAMETROS_PADRAO = {
+    "threshold": 100,
+    "blur": 3,
+    "dilate_size": 3,
+    "dilate_shape": 3,
+    "erode_size": 3,
+    "erode_shape": 3,
+}
+
+# Valores aceitos pelo pipeline (mínimo, máximo; None sem máximo). São mais
+# amplos que os intervalos de busca do algoritmo genético (`LIMITES_PARAMETROS`)
+LIMITES_VALIDOS = {
+    "threshold": (0, 255),
+    "blur": (1, None),
+    "dilate_size": (1, None),
+    "dilate_shape": (1, None),
+    "erode_size": (1, None),
+    "erode_shape": (1, None),
+}
+
+# Número máximo de imagens em uma requisição de lote
+TAMANHO_MAXIMO_LOTE = 256
+
+# Prefixo de cada item no corpo de um lote: tamanho em bytes (uint32 big-endian)
+PREFIXO_ITEM = struct.Struct(">I")
+
+
+def empacotar_lote(itens):
+    """
+    Monta o corpo de um lote: cada item é precedido pelo seu tamanho em bytes.
+
+    Args:
+        itens: Lista de bytes (imagens codificadas)
+
+    Returns:
+        Bytes do lote
+    """
+    return b"".join(PREFIXO_ITEM.pack(len(item)) + bytes(item) for item in itens)
+
+
+def desempacotar_lote(dados):
+    """
+    Separa os itens de um corpo montado por `empacotar_lote`.
+
+    Args:
+        dados: Bytes do lote
+
+    Returns:
+        Lista de bytes de cada item (ValueError se o corpo estiver truncado)
+    """
+    itens = []
+    posicao = 0
+    while posicao < len(dados):
+        if posicao + PREFIXO_ITEM.size > len(dados):
+            raise ValueError("Lote truncado")
+        (tamanho,) = PREFIXO_ITEM.unpack_from(dados, posicao)
+        posicao += PREFIXO_ITEM.size
+        if posicao + tamanho > len(dados):
+            raise ValueError("Lote truncado")
+        itens.append(dados[posicao : posicao + tamanho])
+        posicao += tamanho
+    return itens
+
+
+class RegistroParametros:
+    """
+    Registro thread-safe dos conjuntos de parâmetros carregados no servidor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parametros = {"padrao": dict(PARAMETROS_PADRAO)}
+
+    def registrar(self, nome, params):
+        """
+        Registra (ou substitui) um conjunto de parâmetros.
+
+        Apenas valores que o pipeline não aceita (ver `LIMITES_VALIDOS`) ou
+        parâmetros ausentes são rejeitados, com ValueError.
+
+        Args:
+            nome: Nome do conjunto de parâmetros
+            params: Dicionário com os parâmetros de processamento
+
+        Returns:
+            Cópia dos parâmetros registrados
+        """
+        faltando = set(PARAMETROS_PADRAO) - set(params)
+        if faltando:
+            raise ValueError(f"Parâmetros ausentes: {', '.join(sorted(faltando))}")
+        for param, (minimo, maximo) in LIMITES_VALIDOS.items():
+            valor = params[param]
+            if not isinstance(valor, numbers.Integral) or isinstance(valor, bool):
+                raise ValueError(f"Parâmetro {param} deve ser inteiro: {valor!r}")
+            if valor < minimo or (maximo is not None and valor > maximo):
+                limite = (
+                    f"[{minimo}, {maximo}]" if maximo is not None else f">= {minimo}"
+                )
+                raise ValueError(f"Parâmetro {param}={valor} inválido (use {limite})")
+        params = {param: int(params[param]) for param in PARAMETROS_PADRAO}
+        with self._lock:
+            self._parametros[nome] = params
+        return dict(params)
+
+    def carregar_arquivo(self, nome, caminho):
+        """
+        Carrega parâmetros de um arquivo salvo por `salvar_resultados` ou
+        do arquivo `params_media_*.txt`.
+
+        Args:
+            nome: Nome do conjunto de parâmetros
+            caminho: Caminho para o arquivo de parâmetros
+
+        Returns:
+            Cópia dos parâmetros registrados
+        """
+        resultado = ler_arquivo_parametros(caminho)
+        if resultado is None:
+            raise ValueError(f"Arquivo de parâmetros incompleto: {caminho}")
+        return self.registrar(nome, resultado["parametros"])
+
+    def obter(self, nome):
+        """
+        Retorna o conjunto de parâmetros registrado com o nome informado.
+
+        Args:
+            nome: Nome do conjunto de parâmetros
+
+        Returns:
+            Dicionário com os parâmetros ou None se não existir
+        """
+        with self._lock:
+            params = self._parametros.get(nome)
+        return dict(params) if params is not None else None
+
+    def listar(self):
+        """
+        Retorna uma cópia de todos os conjuntos registrados.
+        """
+        with self._lock:
+            return {nome: dict(params) for nome, params in self._parametros.items()}
+
+
+class MetricasLatencia:
+    """
+    Mantém uma janela das latências mais recentes e calcula percentis.
+
+    Apenas as requisições bem-sucedidas entram nos percentis: as rejeitadas
+    (400/404) respondem muito mais rápido e puxariam os percentis para baixo,
+    então os erros são apenas contados.
+    """
+
+    def __init__(self, janela=10000):
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=janela)
+        self._total = 0
+        self._erros = 0
+
+    def registrar(self, latencia, erro=False):
+        """
+        Registra a latência (em segundos) de uma requisição.
+        """
+        with self._lock:
+            self._total += 1
+            if erro:
+                self._erros += 1
+            else:
+                self._latencias.append(latencia)
+
+    def resumo(self):
+        """
+        Retorna um dicionário com contagens e percentis de latência em milissegundos.
+        """
+        with self._lock:
+            latencias = np.array(self._latencias, dtype=np.float64) * 1000.0
+            resumo = {"total": self._total, "erros": self._erros}
+        if latencias.size:
+            p50, p90, p99 = np.percentile(latencias, [50, 90, 99])
+            resumo.update(
+                {
+                    "p50_ms": float(p50),
+                    "p90_ms": float(p90),
+                    "p99_ms": float(p99),
+                    "max_ms": float(latencias.max()),
+                }
+            )
+        return resumo
+
+
+def _processar_e_codificar(params, imagem, compressao_png):
+    return codificar_imagem(
+        processar_imagem_array(params, imagem), compressao_png=compressao_png
+    )
+
+
+class ProcessadorImagens:
+    """
+    Distribui as imagens recebidas para um pool de trabalhadores.
+
+    Requisições individuais enviam uma imagem ao pool; as de lote
+    (`enviar_lote`) distribuem todas as imagens entre os trabalhadores de uma
+    só vez, então um lote é processado em paralelo e responde em uma única
+    requisição. As funções do OpenCV liberam o GIL, então as threads
+    processam as imagens em paralelo.
+    """
+
+    def __init__(self, trabalhadores=4):
+        self._pool = ThreadPoolExecutor(
+            max_workers=trabalhadores, thread_name_prefix="processador"
+        )
+
+    def enviar(self, imagem, params):
+        """
+        Envia uma imagem para processamento.
+
+        Args:
+            imagem: Imagem BGR já decodificada
+            params: Dicionário com os parâmetros de processamento
+
+        Returns:
+            Future que resolve para a imagem processada
+        """
+        return self._pool.submit(processar_imagem_array, params, imagem)
+
+    def enviar_lote(self, imagens, params, compressao_png=1):
+        """
+        Envia várias imagens para processamento e codificação PNG, distribuídas
+        entre os trabalhadores.
+
+        Args:
+            imagens: Lista de imagens BGR já decodificadas
+            params: Dicionário com os parâmetros de processamento
+            compressao_png: Nível de compressão PNG (0–9)
+
+        Returns:
+            Lista de Futures, na ordem das imagens, que resolvem para os bytes
+            PNG de cada imagem processada (None se a codificação falhar)
+        """
+        return [
+            self._pool.submit(_processar_e_codificar, params, imagem, compressao_png)
+            for imagem in imagens
+        ]
+
+    def encerrar(self):
+        """
+        Aguarda o término das imagens pendentes e libera o pool.
+        """
+        self._pool.shutdown(wait=True)
+
+
+class ManipuladorRequisicoes(BaseHTTPRequestHandler):
+    """
+    Manipulador HTTP do serviço de processamento.
+
+    Rotas:
+        POST /processar?parametros=<nome>  corpo: bytes da imagem -> PNG processado
+        POST /processar_lote?parametros=<nome>
+                                           corpo: imagens em `empacotar_lote` ->
+                                           PNGs processados no mesmo formato
+        GET  /parametros                   lista os conjuntos registrados
+        PUT  /parametros/<nome>            corpo: JSON com os parâmetros
+        GET  /metricas                     percentis de latência (lotes em "lote")
+        GET  /saude                        verificação de disponibilidade
+    """
+
+    server_version = "ProcessadorCaptcha/1.0"
+
+    def log_message(self, format, *args):
+        # Silenciar o log padrão por requisição
+        pass
+
+    def _responder_json(self, status, dados):
+        corpo = json.dumps(dados).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _ler_corpo(self):
+        # ValueError para um Content-Length inválido (resposta 400)
+        valor = self.headers.get("Content-Length", "0")
+        tamanho = int(valor) if valor.strip().isdigit() else -1
+        if tamanho < 0:
+            raise ValueError(f"Content-Length inválido: {valor}")
+        return self.rfile.read(tamanho) if tamanho > 0 else b""
+
+    def do_GET(self):
+        rota = urlparse(self.path).path
+        if rota == "/saude":
+            self._responder_json(200, {"status": "ok"})
+        elif rota == "/parametros":
+            self._responder_json(200, self.server.registro.listar())
+        elif rota == "/metricas":
+            resumo = self.server.metricas.resumo()
+            resumo["lote"] = self.server.metricas_lote.resumo()
+            self._responder_json(200, resumo)
+        else:
+            self._responder_json(404, {"erro": f"Rota não encontrada: {rota}"})
+
+    def do_PUT(self):
+        rota = urlparse(self.path).path
+        if not rota.startswith("/parametros/"):
+            self._responder_json(404, {"erro": f"Rota não encontrada: {rota}"})
+            return
+        nome = rota[len("/parametros/") :]
+        try:
+            params = json.loads(self._ler_corpo().decode("utf-8"))
+            registrado = self.server.registro.registrar(nome, params)
+        except (ValueError, TypeError, AttributeError) as e:
+            self._responder_json(400, {"erro": str(e)})
+            return
+        self._responder_json(200, {nome: registrado})
+
+    def _rejeitar(self, metricas, inicio, status, erro):
+        metricas.registrar(time.perf_counter() - inicio, erro=True)
+        self._responder_json(status, {"erro": erro})
+
+    def _responder_binario(self, tipo, corpo):
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/processar":
+            self._processar(url)
+        elif url.path == "/processar_lote":
+            self._processar_lote(url)
+        else:
+            self._responder_json(404, {"erro": f"Rota não encontrada: {url.path}"})
+
+    def _processar(self, url):
+        inicio = time.perf_counter()
+        metricas = self.server.metricas
+        nome = parse_qs(url.query).get("parametros", ["padrao"])[0]
+        params = self.server.registro.obter(nome)
+        if params is None:
+            self._rejeitar(metricas, inicio, 404, f"Parâmetros não registrados: {nome}")
+            return
+
+        # Decodificar a imagem diretamente da memória, sem arquivos temporários
+        try:
+            imagem = decodificar_imagem(self._ler_corpo())
+        except ValueError as e:
+            self._rejeitar(metricas, inicio, 400, str(e))
+            return
+        if imagem is None:
+            self._rejeitar(
+                metricas, inicio, 400, "Não foi possível decodificar a imagem"
+            )
+            return
+
+        try:
+            imagem_processada = self.server.processador.enviar(imagem, params).result()
+            corpo = codificar_imagem(
+                imagem_processada, compressao_png=self.server.compressao_png
+            )
+            if corpo is None:
+                raise ValueError("Falha ao codificar a imagem processada")
+        except Exception as e:
+            self._rejeitar(metricas, inicio, 500, str(e))
+            return
+
+        self._responder_binario("image/png", corpo)
+        metricas.registrar(time.perf_counter() - inicio)
+
+    def _processar_lote(self, url):
+        inicio = time.perf_counter()
+        metricas = self.server.metricas_lote
+        nome = parse_qs(url.query).get("parametros", ["padrao"])[0]
+        params = self.server.registro.obter(nome)
+        if params is None:
+            self._rejeitar(metricas, inicio, 404, f"Parâmetros não registrados: {nome}")
+            return
+
+        try:
+            itens = desempacotar_lote(self._ler_corpo())
+        except ValueError as e:
+            self._rejeitar(metricas, inicio, 400, str(e))
+            return
+        if not 1 <= len(itens) <= TAMANHO_MAXIMO_LOTE:
+            self._rejeitar(
+                metricas,
+                inicio,
+                400,
+                f"O lote deve ter de 1 a {TAMANHO_MAXIMO_LOTE} imagens",
+            )
+            return
+
+        # Decodificar todas as imagens antes de processar qualquer uma
+        imagens = []
+        for indice, item in enumerate(itens):
+            imagem = decodificar_imagem(item)
+            if imagem is None:
+                self._rejeitar(
+                    metricas,
+                    inicio,
+                    400,
+                    f"Não foi possível decodificar a imagem {indice} do lote",
+                )
+                return
+            imagens.append(imagem)
+
+        # Processar e codificar as imagens em paralelo no pool
+        try:
+            futuros = self.server.processador.enviar_lote(
+                imagens, params, compressao_png=self.server.compressao_png
+            )
+            corpos = [futuro.result() for futuro in futuros]
+            if any(corpo is None for corpo in corpos):
+                raise ValueError("Falha ao codificar uma imagem processada")
+        except Exception as e:
+            self._rejeitar(metricas, inicio, 500, str(e))
+            return
+
+        self._responder_binario("application/octet-stream", empacotar_lote(corpos))
+        metricas.registrar(time.perf_counter() - inicio)
+
+
+class ServidorProcessamento(ThreadingHTTPServer):
+    """
+    Servidor HTTP com uma thread por conexão e fila de conexões ampliada.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def criar_servidor(
+    host="127.0.0.1",
+    porta=8000,
+    trabalhadores=4,
+    registro=None,
+    compressao_png=1,
+):
+    """
+    Cria o servidor HTTP de processamento (sem iniciá-lo).
+
+    Args:
+        host: Endereço de escuta (padrão: apenas localhost)
+        porta: Porta de escuta (0 para escolher uma porta livre)
+        trabalhadores: Número de threads de processamento
+        registro: RegistroParametros a ser usado (opcional)
+        compressao_png: Nível de compressão PNG das respostas (0–9)
+
+    Returns:
+        Instância de ServidorProcessamento pronta para `serve_forever()`
+    """
+    servidor = ServidorProcessamento((host, porta), ManipuladorRequisicoes)
+    servidor.registro = registro or RegistroParametros()
+    servidor.metricas = MetricasLatencia()
+    servidor.metricas_lote = MetricasLatencia()
+    servidor.compressao_png = compressao_png
+    servidor.processador = ProcessadorImagens(trabalhadores=trabalhadores)
+    return servidor
+
+
+def encerrar_servidor(servidor):
+    """
+    Para o servidor e libera o pool de trabalhadores.
+    """
+    servidor.shutdown()
+    servidor.server_close()
+    servidor.processador.encerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serviço HTTP local para aplicar parâmetros aprendidos a captchas."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--trabalhadores", type=int, default=4)
+    parser.add_argument("--compressao-png", type=int, default=1, choices=range(10))
+    parser.add_argument(
+        "--parametros",
+        action="append",
+        default=[],
+        metavar="NOME=ARQUIVO",
+        help="Carrega um arquivo de parâmetros (ex.: media=resultados/params_media_x.txt)",
+    )
+    args = parser.parse_args()
+
+    registro = RegistroParametros()
+    for item in args.parametros:
+        nome, _, caminho = item.partition("=")
+        try:
+            registro.carregar_arquivo(nome, caminho)
+        except (OSError, ValueError) as e:
+            parser.error(f"Não foi possível carregar '{nome}' de {caminho}: {e}")
+        print(f"Parâmetros '{nome}' carregados de {caminho}")
+
+    servidor = criar_servidor(
+        host=args.host,
+        porta=args.porta,
+        trabalhadores=args.trabalhadores,
+        registro=registro,
+        compressao_png=args.compressao_png,
+    )
+    print(f"Servidor escutando em http://{args.host}:{servidor.server_address[1]}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servidor.processador.encerrar()
+
+
+if __name__ == "__main__":
+    main()